@@ -1,32 +1,60 @@
-import json
+import atexit
+import functools
+import hashlib
+import importlib.util
+import inspect
+import logging
 import os
+import re
+import sys
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Callable, Dict, Any, Iterator, List, Mapping, Optional, Tuple
 
 # Import AI client libraries
-import requests
+import httpx
+import orjson
+import tenacity
 
-# Import AI clients with error handling
-try:
-    from openai import OpenAI
-except ImportError:
-    OpenAI = None
+from code_budget import fit_code_to_budget
+from code_chunks import map_reduce
+from llm_cache import llm_cache
+from partial_json import JSONDocumentEnd, parse_partial_json
+from rate_limiter import rate_limited
 
-try:
-    import anthropic
-except ImportError:
-    anthropic = None
+logger = logging.getLogger(__name__)
+
+# SDK clients (openai, anthropic, google-genai) are imported lazily inside the
+# providers that need them, so only the selected provider pays its import cost
 
 try:
-    from google import genai
-except ImportError:
-    genai = None
+    import report_schemas
+except ImportError:  # msgspec is not installed
+    report_schemas = None
+
+@dataclass(frozen=True, slots=True)
+class ProviderSpec:
+    """Static description of an AI provider and the models it offers"""
+    name: str
+    models: Mapping[str, str]
+    api_key_env: str
+    requires: Tuple[str, ...]
+
+    def __post_init__(self):
+        # Freeze the model table and intern its IDs so lookups compare by identity
+        models = MappingProxyType({sys.intern(model_id): label for model_id, label in self.models.items()})
+        object.__setattr__(self, 'models', models)
 
 # Available AI Providers and Models
-AI_PROVIDERS = {
-    'openai': {
-        'name': 'OpenAI',
-        'models': {
+PROVIDERS: Mapping[str, ProviderSpec] = MappingProxyType({
+    'openai': ProviderSpec(
+        name='OpenAI',
+        models={
             'gpt-4o': 'GPT-4o (Latest)',
             'gpt-4o-mini': 'GPT-4o Mini',
             'gpt-4-turbo': 'GPT-4 Turbo',
@@ -37,12 +65,12 @@ AI_PROVIDERS = {
             'gpt-3.5-turbo-16k': 'GPT-3.5 Turbo 16K',
             'gpt-3.5-turbo-1106': 'GPT-3.5 Turbo (Nov 2023)'
         },
-        'api_key_env': 'OPENAI_API_KEY',
-        'requires': ['openai']
-    },
-    'anthropic': {
-        'name': 'Anthropic Claude',
-        'models': {
+        api_key_env='OPENAI_API_KEY',
+        requires=('openai',)
+    ),
+    'anthropic': ProviderSpec(
+        name='Anthropic Claude',
+        models={
             'claude-sonnet-4-20250514': 'Claude 4.0 Sonnet (Latest)',
             'claude-3-7-sonnet-20250219': 'Claude 3.7 Sonnet',
             'claude-3-5-sonnet-20241022': 'Claude 3.5 Sonnet',
@@ -54,12 +82,12 @@ AI_PROVIDERS = {
             'claude-2.0': 'Claude 2.0',
             'claude-instant-1.2': 'Claude Instant 1.2'
         },
-        'api_key_env': 'ANTHROPIC_API_KEY',
-        'requires': ['anthropic']
-    },
-    'gemini': {
-        'name': 'Google Gemini',
-        'models': {
+        api_key_env='ANTHROPIC_API_KEY',
+        requires=('anthropic',)
+    ),
+    'gemini': ProviderSpec(
+        name='Google Gemini',
+        models={
             'gemini-2.5-pro': 'Gemini 2.5 Pro (Latest)',
             'gemini-2.5-flash': 'Gemini 2.5 Flash',
             'gemini-1.5-pro': 'Gemini 1.5 Pro',
@@ -68,24 +96,24 @@ AI_PROVIDERS = {
             'gemini-pro': 'Gemini Pro',
             'gemini-pro-vision': 'Gemini Pro Vision'
         },
-        'api_key_env': 'GEMINI_API_KEY',
-        'requires': ['google-genai']
-    },
-    'xai': {
-        'name': 'xAI Grok',
-        'models': {
+        api_key_env='GEMINI_API_KEY',
+        requires=('google-genai',)
+    ),
+    'xai': ProviderSpec(
+        name='xAI Grok',
+        models={
             'grok-2-vision-1212': 'Grok 2 Vision (Latest)',
             'grok-2-1212': 'Grok 2',
             'grok-vision-beta': 'Grok Vision Beta',
             'grok-beta': 'Grok Beta',
             'grok-1': 'Grok 1'
         },
-        'api_key_env': 'XAI_API_KEY',
-        'requires': ['openai']  # Uses OpenAI-compatible API
-    },
-    'perplexity': {
-        'name': 'Perplexity',
-        'models': {
+        api_key_env='XAI_API_KEY',
+        requires=('openai',)  # Uses OpenAI-compatible API
+    ),
+    'perplexity': ProviderSpec(
+        name='Perplexity',
+        models={
             'llama-3.1-sonar-huge-128k-online': 'Llama 3.1 Sonar Huge (Online)',
             'llama-3.1-sonar-large-128k-online': 'Llama 3.1 Sonar Large (Online)',
             'llama-3.1-sonar-small-128k-online': 'Llama 3.1 Sonar Small (Online)',
@@ -98,12 +126,12 @@ AI_PROVIDERS = {
             'mistral-7b-instruct': 'Mistral 7B Instruct',
             'mixtral-8x7b-instruct': 'Mixtral 8x7B Instruct'
         },
-        'api_key_env': 'PERPLEXITY_API_KEY',
-        'requires': ['requests']
-    },
-    'cohere': {
-        'name': 'Cohere',
-        'models': {
+        api_key_env='PERPLEXITY_API_KEY',
+        requires=('httpx',)
+    ),
+    'cohere': ProviderSpec(
+        name='Cohere',
+        models={
             'command-r-plus': 'Command R+ (Latest)',
             'command-r': 'Command R',
             'command': 'Command',
@@ -111,12 +139,12 @@ AI_PROVIDERS = {
             'command-light': 'Command Light',
             'command-light-nightly': 'Command Light Nightly'
         },
-        'api_key_env': 'COHERE_API_KEY',
-        'requires': ['requests']
-    },
-    'mistral': {
-        'name': 'Mistral AI',
-        'models': {
+        api_key_env='COHERE_API_KEY',
+        requires=('httpx',)
+    ),
+    'mistral': ProviderSpec(
+        name='Mistral AI',
+        models={
             'mistral-large-latest': 'Mistral Large (Latest)',
             'mistral-medium-latest': 'Mistral Medium',
             'mistral-small-latest': 'Mistral Small',
@@ -126,12 +154,12 @@ AI_PROVIDERS = {
             'codestral-latest': 'Codestral (Code)',
             'mistral-embed': 'Mistral Embed'
         },
-        'api_key_env': 'MISTRAL_API_KEY',
-        'requires': ['requests']
-    },
-    'huggingface': {
-        'name': 'HuggingFace',
-        'models': {
+        api_key_env='MISTRAL_API_KEY',
+        requires=('httpx',)
+    ),
+    'huggingface': ProviderSpec(
+        name='HuggingFace',
+        models={
             'meta-llama/Llama-2-70b-chat-hf': 'Llama 2 70B Chat',
             'meta-llama/Llama-2-13b-chat-hf': 'Llama 2 13B Chat',
             'meta-llama/Llama-2-7b-chat-hf': 'Llama 2 7B Chat',
@@ -141,12 +169,12 @@ AI_PROVIDERS = {
             'Salesforce/codegen-16B-mono': 'CodeGen 16B',
             'bigcode/starcoder': 'StarCoder'
         },
-        'api_key_env': 'HUGGINGFACE_API_KEY',
-        'requires': ['requests']
-    },
-    'together': {
-        'name': 'Together AI',
-        'models': {
+        api_key_env='HUGGINGFACE_API_KEY',
+        requires=('httpx',)
+    ),
+    'together': ProviderSpec(
+        name='Together AI',
+        models={
             'meta-llama/Llama-2-70b-chat-hf': 'Llama 2 70B Chat',
             'meta-llama/Llama-2-13b-chat-hf': 'Llama 2 13B Chat',
             'meta-llama/Llama-2-7b-chat-hf': 'Llama 2 7B Chat',
@@ -156,24 +184,516 @@ AI_PROVIDERS = {
             'WizardLM/WizardCoder-Python-34B-V1.0': 'WizardCoder Python 34B',
             'Phind/Phind-CodeLlama-34B-v2': 'Phind CodeLlama 34B v2'
         },
-        'api_key_env': 'TOGETHER_API_KEY',
-        'requires': ['requests']
-    }
+        api_key_env='TOGETHER_API_KEY',
+        requires=('httpx',)
+    )
+})
+
+# HTTP/2 needs the optional h2 package (the httpx[http2] extra)
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+# One keep-alive pool shared by the OpenAI, xAI and Anthropic SDK clients, the
+# Perplexity and OpenAI-compatible HTTP providers and API key validation, instead
+# of a separate default-sized pool (or a fresh connection) per client. Idle
+# connections are kept for a minute (httpx defaults to 5s) so uploads a few
+# seconds apart, and the startup pre-warm, skip the TLS handshake.
+KEEPALIVE_EXPIRY = float(os.environ.get('AI_KEEPALIVE_EXPIRY', 60))
+_SHARED_HTTP = httpx.Client(
+    http2=HTTP2_AVAILABLE,
+    limits=httpx.Limits(max_connections=500, max_keepalive_connections=200, keepalive_expiry=KEEPALIVE_EXPIRY),
+    timeout=120
+)
+atexit.register(_SHARED_HTTP.close)
+
+# Per-request timeout for chat completion calls: a stalled long-tail response
+# is abandoned and re-issued rather than holding a worker for minutes
+REQUEST_TIMEOUT = httpx.Timeout(float(os.environ.get('AI_REQUEST_TIMEOUT', 30)), connect=5.0)
+
+# System messages shared by every provider, kept byte-identical across calls
+SYSTEM_REVIEWER = "You are an expert code reviewer and static analysis tool. Provide detailed, actionable feedback on code quality, security, and best practices."
+SYSTEM_TESTER = "You are an expert test engineer. Generate comprehensive, practical test cases that follow testing best practices and cover edge cases."
+SYSTEM_ARCHITECT = "You are a senior software architect and code mentor. Provide actionable, specific suggestions for code improvement."
+
+# Variants for APIs without a JSON response mode
+JSON_REMINDER = " Always respond with valid JSON."
+SYSTEM_REVIEWER_JSON = SYSTEM_REVIEWER + JSON_REMINDER
+SYSTEM_TESTER_JSON = SYSTEM_TESTER + JSON_REMINDER
+SYSTEM_ARCHITECT_JSON = SYSTEM_ARCHITECT + JSON_REMINDER
+
+# Pre-built chat-completions system messages; never mutate these
+SYS_REVIEWER = {"role": "system", "content": SYSTEM_REVIEWER}
+SYS_TESTER = {"role": "system", "content": SYSTEM_TESTER}
+SYS_ARCHITECT = {"role": "system", "content": SYSTEM_ARCHITECT}
+SYS_REVIEWER_JSON = {"role": "system", "content": SYSTEM_REVIEWER_JSON}
+SYS_TESTER_JSON = {"role": "system", "content": SYSTEM_TESTER_JSON}
+SYS_ARCHITECT_JSON = {"role": "system", "content": SYSTEM_ARCHITECT_JSON}
+
+# Static instructions shared by every provider. They lead the prompt and the
+# per-call language and code come last, so every request shares one long
+# identical prefix that provider-side prompt caching can reuse.
+QUALITY_INSTRUCTIONS = """Analyze the provided code for quality, best practices, and potential issues.
+Provide a comprehensive analysis in JSON format with the following structure:
+{
+    "quality_score": <number between 0-100>,
+    "issues": [
+        {
+            "type": "error|warning|suggestion",
+            "severity": "high|medium|low",
+            "line": <line_number_or_null>,
+            "message": "description of the issue",
+            "suggestion": "how to fix it"
+        }
+    ],
+    "metrics": {
+        "complexity": "low|medium|high",
+        "maintainability": <number between 0-100>,
+        "readability": <number between 0-100>,
+        "security": <number between 0-100>
+    },
+    "summary": "Overall summary of code quality",
+    "recommendations": [
+        "list of general recommendations for improvement"
+    ]
+}
+"""
+
+TEST_INSTRUCTIONS = """Generate comprehensive test cases for the provided code.
+Provide the response in JSON format with the following structure:
+{
+    "test_framework": "recommended testing framework for the code's language",
+    "test_cases": [
+        {
+            "name": "test case name",
+            "description": "what this test validates",
+            "type": "unit|integration|edge_case",
+            "priority": "high|medium|low",
+            "test_code": "actual test code implementation"
+        }
+    ],
+    "coverage_suggestions": [
+        "areas that need more test coverage"
+    ],
+    "mocking_suggestions": [
+        "components that should be mocked and why"
+    ]
 }
+"""
+
+SUGGESTIONS_INSTRUCTIONS = """Provide specific code improvement suggestions for the provided code.
+Focus on performance, security, maintainability, and best practices.
+Respond in JSON format:
+{
+    "refactoring_suggestions": [
+        {
+            "category": "performance|security|maintainability|style",
+            "description": "what to improve",
+            "before_code": "current problematic code snippet",
+            "after_code": "improved code snippet",
+            "explanation": "why this improvement matters"
+        }
+    ],
+    "architecture_suggestions": [
+        "high-level architectural improvements"
+    ],
+    "dependency_suggestions": [
+        "library or framework recommendations"
+    ]
+}
+"""
+
+# Instructions for structured-output calls, where the JSON Schema travels in response_format
+QUALITY_STRUCTURED_INSTRUCTIONS = """Analyze the provided code for quality, best practices, and potential issues.
+"""
+
+TEST_STRUCTURED_INSTRUCTIONS = """Generate comprehensive test cases for the provided code.
+"""
+
+SUGGESTIONS_STRUCTURED_INSTRUCTIONS = """Provide specific code improvement suggestions for the provided code.
+Focus on performance, security, maintainability, and best practices.
+"""
+
+# Gemini calls carry no system message, so these lead the prompt instead
+GEMINI_PERSONA_REVIEWER = "You are an expert code reviewer and static analysis tool. "
+GEMINI_PERSONA_TESTER = "You are an expert test engineer. "
+GEMINI_PERSONA_ARCHITECT = "You are a senior software architect and code mentor. "
+
+# Anthropic system blocks: persona plus instructions, marked as a prompt-cache
+# breakpoint so the static prefix is billed at the cached rate on repeat calls
+def _cached_system_block(system: str, instructions: str) -> List[Dict[str, Any]]:
+    return [{"type": "text", "text": f"{system}\n\n{instructions}", "cache_control": {"type": "ephemeral"}}]
+
+ANTHROPIC_SYSTEM_REVIEWER = _cached_system_block(SYSTEM_REVIEWER_JSON, QUALITY_INSTRUCTIONS)
+ANTHROPIC_SYSTEM_TESTER = _cached_system_block(SYSTEM_TESTER_JSON, TEST_INSTRUCTIONS)
+ANTHROPIC_SYSTEM_ARCHITECT = _cached_system_block(SYSTEM_ARCHITECT_JSON, SUGGESTIONS_INSTRUCTIONS)
+
+# Fingerprint of every prompt above; stored results are only reused under the same prompts
+PROMPT_VERSION = hashlib.sha256('\0'.join((
+    SYSTEM_REVIEWER_JSON, SYSTEM_TESTER_JSON, SYSTEM_ARCHITECT_JSON,
+    QUALITY_INSTRUCTIONS, TEST_INSTRUCTIONS, SUGGESTIONS_INSTRUCTIONS,
+    QUALITY_STRUCTURED_INSTRUCTIONS, TEST_STRUCTURED_INSTRUCTIONS, SUGGESTIONS_STRUCTURED_INSTRUCTIONS,
+    GEMINI_PERSONA_REVIEWER, GEMINI_PERSONA_TESTER, GEMINI_PERSONA_ARCHITECT
+)).encode('utf-8')).hexdigest()[:16]
+
+# The per-call tail appended after the instructions: these fixed pieces with the
+# language and the code between them. Joined rather than str.format()ed so the
+# code is copied once and never scanned for placeholders.
+CODE_SECTION_LANGUAGE = "\nLanguage: "
+CODE_SECTION_CODE = "\n\nCode:\n"
+
+# OpenAI models that accept response_format={"type": "json_schema", ...}
+STRUCTURED_OUTPUT_MODEL_PREFIXES = ('gpt-4o',)
+
+# Prompts are memoized on (instructions, code, language): one analysis formats the
+# same file for three reports, and comparing providers repeats that per provider.
+# Kept small because each entry pins a copy of the submitted code.
+PROMPT_CACHE_SIZE = 32
+
+@functools.lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def build_prompt(instructions: str, code_content: str, language: str, persona: str = '') -> str:
+    """Append the language and code (fitted to the token budget) to static instructions"""
+    return ''.join((
+        persona, instructions,
+        CODE_SECTION_LANGUAGE, language,
+        CODE_SECTION_CODE, fit_code_to_budget(code_content, language), "\n"
+    ))
+
+class PromptMixin:
+    """Builds the analysis prompts from the shared module-level templates"""
+
+    __slots__ = ()
+
+    @property
+    def prompt_fingerprint(self) -> str:
+        """Identifies the prompts and response format a result was produced with (part of the LLM cache key)"""
+        return PROMPT_VERSION
+
+    @staticmethod
+    def _build_quality_prompt(code_content: str, language: str) -> str:
+        return build_prompt(QUALITY_INSTRUCTIONS, code_content, language)
+
+    @staticmethod
+    def _build_test_prompt(code_content: str, language: str) -> str:
+        return build_prompt(TEST_INSTRUCTIONS, code_content, language)
+
+    @staticmethod
+    def _build_suggestions_prompt(code_content: str, language: str) -> str:
+        return build_prompt(SUGGESTIONS_INSTRUCTIONS, code_content, language)
+
+class GeminiPromptMixin(PromptMixin):
+    """Gemini calls carry no system message, so the persona leads the prompt"""
+
+    __slots__ = ()
+
+    @staticmethod
+    def _build_quality_prompt(code_content: str, language: str) -> str:
+        return build_prompt(QUALITY_INSTRUCTIONS, code_content, language, GEMINI_PERSONA_REVIEWER)
+
+    @staticmethod
+    def _build_test_prompt(code_content: str, language: str) -> str:
+        return build_prompt(TEST_INSTRUCTIONS, code_content, language, GEMINI_PERSONA_TESTER)
+
+    @staticmethod
+    def _build_suggestions_prompt(code_content: str, language: str) -> str:
+        return build_prompt(SUGGESTIONS_INSTRUCTIONS, code_content, language, GEMINI_PERSONA_ARCHITECT)
+
+class AnthropicPromptMixin(PromptMixin):
+    """Anthropic calls carry the instructions in a cached system block, so the prompt is just the code"""
+
+    __slots__ = ()
+
+    @staticmethod
+    def _build_quality_prompt(code_content: str, language: str) -> str:
+        return build_prompt('', code_content, language)
+
+    _build_test_prompt = _build_quality_prompt
+    _build_suggestions_prompt = _build_quality_prompt
+
+class StructuredOutputMixin(PromptMixin):
+    """Uses strict JSON Schema structured outputs on models that support them.
+
+    The schema is sent in response_format instead of being spelled out in the
+    prompt, and responses are decoded and validated by msgspec.
+    """
+
+    __slots__ = ()
+
+    @property
+    def _structured_outputs(self) -> bool:
+        return report_schemas is not None and self.model.startswith(STRUCTURED_OUTPUT_MODEL_PREFIXES)
+
+    @property
+    def prompt_fingerprint(self) -> str:
+        if self._structured_outputs:
+            return f"{PROMPT_VERSION}:json_schema:{report_schemas.SCHEMA_VERSION}"
+        return f"{PROMPT_VERSION}:json_object"
+
+    def _build_quality_prompt(self, code_content: str, language: str) -> str:
+        if self._structured_outputs:
+            return build_prompt(QUALITY_STRUCTURED_INSTRUCTIONS, code_content, language)
+        return PromptMixin._build_quality_prompt(code_content, language)
+
+    def _build_test_prompt(self, code_content: str, language: str) -> str:
+        if self._structured_outputs:
+            return build_prompt(TEST_STRUCTURED_INSTRUCTIONS, code_content, language)
+        return PromptMixin._build_test_prompt(code_content, language)
+
+    def _build_suggestions_prompt(self, code_content: str, language: str) -> str:
+        if self._structured_outputs:
+            return build_prompt(SUGGESTIONS_STRUCTURED_INSTRUCTIONS, code_content, language)
+        return PromptMixin._build_suggestions_prompt(code_content, language)
+
+    def _response_format(self, report: str) -> Dict[str, Any]:
+        if self._structured_outputs:
+            return report_schemas.RESPONSE_FORMATS[report]
+        return {"type": "json_object"}
+
+    def _decode_response(self, content: str, report: str) -> Dict[str, Any]:
+        if self._structured_outputs:
+            return report_schemas.decode_report(content, report)
+        return orjson.loads(content)
+
+# Inputs shorter than this (after stripping) or longer than the hard cap are
+# answered directly; oversized files are refused rather than truncated
+MIN_CODE_CHARS = 10
+MAX_CODE_CHARS = int(os.environ.get('AI_MAX_CODE_CHARS', 1_000_000))
+
+def _preflight_reason(code_content: str) -> Optional[str]:
+    """Why an input is not worth sending to a model, or None if it is"""
+    if len(code_content.strip()) < MIN_CODE_CHARS:
+        return "The file is empty or too short to analyze."
+    if len(code_content) > MAX_CODE_CHARS:
+        return f"The file exceeds the {MAX_CODE_CHARS:,} character limit for analysis."
+    # Binary uploads survive the lenient utf-8 decode as NULs, control
+    # characters and replacement characters
+    sample = code_content[:8192]
+    unreadable = sum(1 for char in sample if char == '\ufffd' or (not char.isprintable() and char not in '\r\n\t\f\v'))
+    if '\x00' in sample or unreadable > len(sample) // 10:
+        return "The file does not look like text source code."
+    return None
+
+def _direct_response(method_name: str, reason: str) -> Dict[str, Any]:
+    if method_name == 'analyze_code_quality':
+        return {
+            "quality_score": 0,
+            "issues": [],
+            "metrics": {},
+            "summary": reason,
+            "recommendations": []
+        }
+    elif method_name == 'generate_test_cases':
+        return {
+            "test_framework": "",
+            "test_cases": [],
+            "coverage_suggestions": [],
+            "mocking_suggestions": []
+        }
+    return {
+        "refactoring_suggestions": [],
+        "architecture_suggestions": [],
+        "dependency_suggestions": []
+    }
+
+def preflight_response(method_name: str, code_content: str) -> Optional[Dict[str, Any]]:
+    """Canned report for inputs a model call would be wasted on, or None to proceed"""
+    reason = _preflight_reason(code_content)
+    return _direct_response(method_name, reason) if reason else None
+
+def preflight(method):
+    """Answer empty, oversized or binary inputs directly instead of calling the model"""
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, code_content: str, language: str):
+            direct = preflight_response(method.__name__, code_content)
+            if direct is not None:
+                return direct
+            return await method(self, code_content, language)
+        return async_wrapper
+    
+    @functools.wraps(method)
+    def wrapper(self, code_content: str, language: str):
+        direct = preflight_response(method.__name__, code_content)
+        if direct is not None:
+            return direct
+        return method(self, code_content, language)
+    return wrapper
+
+# Attempts per remote call, counting the first one. Batch jobs aren't wrapped in
+# retry_transient and hand the retries to the SDK as max_retries instead.
+MAX_RETRIES = 5
+
+# Re-issues of a call that timed out; a second stall is unlikely to be a fluke
+TIMEOUT_RETRIES = 1
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+class ProviderAPIError(Exception):
+    """Non-success HTTP response from a provider API"""
+    
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+def _error_status_code(error: BaseException) -> Optional[int]:
+    """HTTP status of a failed provider call, from the SDK error or its response"""
+    status_code = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    response = getattr(error, 'response', None)
+    if status_code is None and response is not None:
+        status_code = getattr(response, 'status_code', None)
+    return status_code
+
+def _transport_error(error: BaseException) -> Optional[httpx.TransportError]:
+    """The httpx error behind a failed call; SDK clients re-raise it as their own error type"""
+    while error is not None:
+        if isinstance(error, httpx.TransportError):
+            return error
+        error = error.__cause__
+    return None
+
+def _is_transient(error: BaseException) -> bool:
+    """Whether a failed provider call is worth retrying"""
+    if _transport_error(error) is not None:
+        return True
+    return _error_status_code(error) in RETRYABLE_STATUS_CODES
+
+def _timeout_retries_exhausted(retry_state) -> bool:
+    """Stop retrying once a call has timed out more than TIMEOUT_RETRIES times"""
+    if not isinstance(_transport_error(retry_state.outcome.exception()), httpx.TimeoutException):
+        return False
+    retry_state.timeouts = getattr(retry_state, 'timeouts', 0) + 1
+    return retry_state.timeouts > TIMEOUT_RETRIES
+
+# Retry transient failures with jittered exponential backoff, re-raising the
+# last error once the attempts are used up. This is the only retry layer for
+# the calls it wraps, so SDK clients behind it are built with max_retries=0.
+retry_transient = tenacity.retry(
+    stop=tenacity.stop_after_attempt(MAX_RETRIES) | _timeout_retries_exhausted,
+    wait=tenacity.wait_exponential_jitter(initial=1, max=30),
+    retry=tenacity.retry_if_exception(_is_transient),
+    reraise=True
+)
+
+# Warm up provider connections in the background when a provider is created
+PREWARM_CONNECTIONS = os.environ.get('AI_PREWARM_CONNECTIONS', '1').lower() not in ('0', 'false', 'no')
+
+# SDK clients reused across provider instances, keyed on (provider class,
+# api key fingerprint, base url). Routes build a provider per request, so this
+# is what lets connection pools and SDK setup carry over between requests.
+CLIENT_CACHE_SIZE = 64
+_CLIENT_CACHE = OrderedDict()
+_CLIENT_CACHE_LOCK = threading.Lock()
+
+def _client_cache_key(provider) -> Tuple:
+    # Never keep the raw key around in the cache
+    fingerprint = hashlib.sha256((provider.api_key or '').encode('utf-8')).hexdigest()
+    return (type(provider), fingerprint, getattr(provider, 'base_url', None))
+
+def _get_or_create_client(provider) -> Tuple[Any, bool]:
+    """Return (client, created) for a provider, reusing a cached client when one exists"""
+    key = _client_cache_key(provider)
+    with _CLIENT_CACHE_LOCK:
+        client = _CLIENT_CACHE.get(key)
+        if client is not None:
+            _CLIENT_CACHE.move_to_end(key)
+            return client, False
+    
+    # Build outside the lock; if another thread won the race, use its client
+    client = provider._initialize_client()
+    if client is None:
+        return None, True
+    with _CLIENT_CACHE_LOCK:
+        existing = _CLIENT_CACHE.setdefault(key, client)
+        _CLIENT_CACHE.move_to_end(key)
+        while len(_CLIENT_CACHE) > CLIENT_CACHE_SIZE:
+            _CLIENT_CACHE.popitem(last=False)
+    return existing, existing is client
+
+# The three independent reports produced for every analyzed file
+ANALYSIS_METHODS = ('analyze_code_quality', 'generate_test_cases', 'get_code_suggestions')
+
+# Long-lived worker threads for analyze_all, shared by every request instead of a
+# pool started and joined per analysis. Only analyze_all submits here: the chunk
+# fan-out below it uses its own pool, so a full pool cannot deadlock on itself.
+# Sized for three reports per request thread of a default gunicorn worker.
+ANALYSIS_WORKERS = int(os.environ.get('AI_ANALYSIS_WORKERS', 96))
+_ANALYSIS_EXECUTOR = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='analysis')
+
+# report -> (analysis method, prompt builder, temperature) for the streaming variants
+STREAM_TASKS = MappingProxyType({
+    'quality': ('analyze_code_quality', '_build_quality_prompt', 0.3),
+    'tests': ('generate_test_cases', '_build_test_prompt', 0.4),
+    'suggestions': ('get_code_suggestions', '_build_suggestions_prompt', 0.3)
+})
+
+# Minimum seconds between partial parses of a streamed report; reparsing the
+# growing buffer on every token delta would cost quadratic time
+STREAM_UPDATE_INTERVAL = 0.05
+
+def _partial_reports(deltas: Iterator[str], decode: Callable[[str], Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Yield a parsed snapshot at most every STREAM_UPDATE_INTERVAL as the JSON grows, then the decoded full report"""
+    parts = []
+    last = None
+    next_update = 0.0
+    document = JSONDocumentEnd()
+    for delta in deltas:
+        if document.complete:
+            if delta.strip():
+                # The model kept writing past the report; stop paying for it
+                break
+            continue
+        end = document.feed(delta)
+        parts.append(delta if end < 0 else delta[:end])
+        now = time.monotonic()
+        if now < next_update:
+            continue
+        next_update = now + STREAM_UPDATE_INTERVAL
+        partial = parse_partial_json(''.join(parts))
+        if isinstance(partial, dict) and partial != last:
+            last = partial
+            yield partial
+    yield decode(''.join(parts))
+
+def _read_document(deltas: Iterator[str]) -> str:
+    """Join streamed deltas up to the end of the JSON document, cutting off any text the model adds after it"""
+    parts = []
+    document = JSONDocumentEnd()
+    for delta in deltas:
+        if document.complete:
+            if delta.strip():
+                break
+            continue
+        end = document.feed(delta)
+        parts.append(delta if end < 0 else delta[:end])
+    return ''.join(parts)
 
 class AIProvider(ABC):
     """Abstract base class for AI providers"""
     
+    __slots__ = ('api_key', 'model', 'client')
+    
     def __init__(self, api_key: str, model: str):
         self.api_key = api_key
         self.model = model
-        self.client = self._initialize_client()
+        self.client, created = _get_or_create_client(self)
+        # A reused client's connections are already warm
+        if created and PREWARM_CONNECTIONS:
+            threading.Thread(target=self._run_prewarm, daemon=True).start()
     
     @abstractmethod
     def _initialize_client(self):
         """Initialize the AI client"""
         pass
     
+    def _prewarm(self):
+        """Issue a cheap request so the first real call finds a warm connection"""
+        pass
+    
+    def _run_prewarm(self):
+        try:
+            self._prewarm()
+        except Exception as e:
+            logger.debug("Connection pre-warm for %s failed: %s", type(self).__name__, e)
+    
     @abstractmethod
     def analyze_code_quality(self, code_content: str, language: str) -> Dict[str, Any]:
         """Analyze code quality"""
@@ -188,428 +708,253 @@ class AIProvider(ABC):
     def get_code_suggestions(self, code_content: str, language: str) -> Dict[str, Any]:
         """Get code improvement suggestions"""
         pass
+    
+    def analyze_all(self, code_content: str, language: str) -> Dict[str, Dict[str, Any]]:
+        """Run quality analysis, test generation and suggestions in parallel threads, keyed by method name"""
+        # The calls are network-bound and independent, so they take as long as the slowest one
+        futures = {
+            method_name: _ANALYSIS_EXECUTOR.submit(getattr(self, method_name), code_content, language)
+            for method_name in ANALYSIS_METHODS
+        }
+        return {method_name: future.result() for method_name, future in futures.items()}
+    
+    def stream_analyze_code_quality(self, code_content: str, language: str) -> Iterator[Dict[str, Any]]:
+        """Yield partial quality reports as the response streams; the last one is complete"""
+        return self._stream_checked('quality', code_content, language)
+    
+    def stream_generate_test_cases(self, code_content: str, language: str) -> Iterator[Dict[str, Any]]:
+        """Yield partial test reports as the response streams; the last one is complete"""
+        return self._stream_checked('tests', code_content, language)
+    
+    def stream_get_code_suggestions(self, code_content: str, language: str) -> Iterator[Dict[str, Any]]:
+        """Yield partial suggestion reports as the response streams; the last one is complete"""
+        return self._stream_checked('suggestions', code_content, language)
+    
+    def _stream_checked(self, report: str, code_content: str, language: str) -> Iterator[Dict[str, Any]]:
+        method_name, _, _ = STREAM_TASKS[report]
+        direct = preflight_response(method_name, code_content)
+        if direct is not None:
+            yield direct
+            return
+        yield from self._stream(report, code_content, language)
+    
+    def _stream(self, report: str, code_content: str, language: str) -> Iterator[Dict[str, Any]]:
+        # Providers without a streaming implementation yield the finished report once
+        method_name, _, _ = STREAM_TASKS[report]
+        yield getattr(self, method_name)(code_content, language)
+    
+    def _stream_prompt(self, report: str, code_content: str, language: str) -> Tuple[str, float]:
+        _, builder_name, temperature = STREAM_TASKS[report]
+        return getattr(self, builder_name)(code_content, language), temperature
+
+_OPENAI_SYSTEM_MESSAGES = MappingProxyType({'quality': SYS_REVIEWER, 'tests': SYS_TESTER, 'suggestions': SYS_ARCHITECT})
 
-class OpenAIProvider(AIProvider):
+class OpenAIProvider(StructuredOutputMixin, AIProvider):
     """OpenAI provider implementation"""
     
+    __slots__ = ()
+    
     def _initialize_client(self):
-        return OpenAI(api_key=self.api_key)
+        from openai import OpenAI
+        return OpenAI(api_key=self.api_key, timeout=REQUEST_TIMEOUT, max_retries=0, http_client=_SHARED_HTTP)
+    
+    def _prewarm(self):
+        self.client.models.list()
     
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def analyze_code_quality(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_quality_prompt(code_content, language)
-        
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "You are an expert code reviewer and static analysis tool. Provide detailed, actionable feedback on code quality, security, and best practices."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.3
-        )
-        
-        return json.loads(response.choices[0].message.content)
+        return self._complete('quality', prompt, 0.3)
     
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def generate_test_cases(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_test_prompt(code_content, language)
-        
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "You are an expert test engineer. Generate comprehensive, practical test cases that follow testing best practices and cover edge cases."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.4
-        )
-        
-        return json.loads(response.choices[0].message.content)
+        return self._complete('tests', prompt, 0.4)
     
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def get_code_suggestions(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_suggestions_prompt(code_content, language)
-        
-        response = self.client.chat.completions.create(
+        return self._complete('suggestions', prompt, 0.3)
+    
+    def _open_stream(self, report: str, prompt: str, temperature: float):
+        return self.client.chat.completions.create(
             model=self.model,
             messages=[
-                {"role": "system", "content": "You are a senior software architect and code mentor. Provide actionable, specific suggestions for code improvement."},
+                _OPENAI_SYSTEM_MESSAGES[report],
                 {"role": "user", "content": prompt}
             ],
-            response_format={"type": "json_object"},
-            temperature=0.3
+            response_format=self._response_format(report),
+            temperature=temperature,
+            stream=True
         )
-        
-        return json.loads(response.choices[0].message.content)
     
-    def _build_quality_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        Analyze the following {language} code for quality, best practices, and potential issues.
-        Provide a comprehensive analysis in JSON format with the following structure:
-        {{
-            "quality_score": <number between 0-100>,
-            "issues": [
-                {{
-                    "type": "error|warning|suggestion",
-                    "severity": "high|medium|low",
-                    "line": <line_number_or_null>,
-                    "message": "description of the issue",
-                    "suggestion": "how to fix it"
-                }}
-            ],
-            "metrics": {{
-                "complexity": "low|medium|high",
-                "maintainability": <number between 0-100>,
-                "readability": <number between 0-100>,
-                "security": <number between 0-100>
-            }},
-            "summary": "Overall summary of code quality",
-            "recommendations": [
-                "list of general recommendations for improvement"
-            ]
-        }}
-
-        Code to analyze:
-        {code_content}
-        """
+    @staticmethod
+    def _deltas(stream) -> Iterator[str]:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
     
-    def _build_test_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        Generate comprehensive test cases for the following {language} code.
-        Provide the response in JSON format with the following structure:
-        {{
-            "test_framework": "recommended testing framework for {language}",
-            "test_cases": [
-                {{
-                    "name": "test case name",
-                    "description": "what this test validates",
-                    "type": "unit|integration|edge_case",
-                    "priority": "high|medium|low",
-                    "test_code": "actual test code implementation"
-                }}
-            ],
-            "coverage_suggestions": [
-                "areas that need more test coverage"
-            ],
-            "mocking_suggestions": [
-                "components that should be mocked and why"
-            ]
-        }}
-
-        Code to generate tests for:
-        {code_content}
-        """
+    @retry_transient
+    def _complete(self, report: str, prompt: str, temperature: float) -> Dict[str, Any]:
+        # Streamed so anything the model writes after the report's JSON is cut off unread
+        with self._open_stream(report, prompt, temperature) as stream:
+            content = _read_document(self._deltas(stream))
+        return self._decode_response(content, report)
     
-    def _build_suggestions_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        Provide specific code improvement suggestions for the following {language} code.
-        Focus on performance, security, maintainability, and best practices.
-        Respond in JSON format:
-        {{
-            "refactoring_suggestions": [
-                {{
-                    "category": "performance|security|maintainability|style",
-                    "description": "what to improve",
-                    "before_code": "current problematic code snippet",
-                    "after_code": "improved code snippet",
-                    "explanation": "why this improvement matters"
-                }}
-            ],
-            "architecture_suggestions": [
-                "high-level architectural improvements"
-            ],
-            "dependency_suggestions": [
-                "library or framework recommendations"
-            ]
-        }}
-
-        Code to improve:
-        {code_content}
-        """
+    def _stream(self, report: str, code_content: str, language: str) -> Iterator[Dict[str, Any]]:
+        prompt, temperature = self._stream_prompt(report, code_content, language)
+        with self._open_stream(report, prompt, temperature) as stream:
+            yield from _partial_reports(self._deltas(stream), lambda content: self._decode_response(content, report))
 
-class AnthropicProvider(AIProvider):
+class AnthropicProvider(AnthropicPromptMixin, AIProvider):
     """Anthropic provider implementation"""
     
+    __slots__ = ()
+    
     def _initialize_client(self):
-        return anthropic.Anthropic(api_key=self.api_key)
+        import anthropic
+        return anthropic.Anthropic(api_key=self.api_key, timeout=REQUEST_TIMEOUT, max_retries=0, http_client=_SHARED_HTTP)
     
-    def analyze_code_quality(self, code_content: str, language: str) -> Dict[str, Any]:
-        prompt = self._build_quality_prompt(code_content, language)
-        
-        response = self.client.messages.create(
+    def _prewarm(self):
+        # Token counting is free and opens the same connection real calls use
+        self.client.messages.count_tokens(
             model=self.model,
-            max_tokens=4000,
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            system="You are an expert code reviewer and static analysis tool. Provide detailed, actionable feedback on code quality, security, and best practices. Always respond with valid JSON."
+            messages=[{"role": "user", "content": "Hi"}]
         )
-        
-        return json.loads(response.content[0].text)
     
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    def analyze_code_quality(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_quality_prompt(code_content, language)
+        return self._create(prompt, ANTHROPIC_SYSTEM_REVIEWER)
+    
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def generate_test_cases(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_test_prompt(code_content, language)
-        
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=4000,
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            system="You are an expert test engineer. Generate comprehensive, practical test cases that follow testing best practices and cover edge cases. Always respond with valid JSON."
-        )
-        
-        return json.loads(response.content[0].text)
+        return self._create(prompt, ANTHROPIC_SYSTEM_TESTER)
     
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def get_code_suggestions(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_suggestions_prompt(code_content, language)
-        
+        return self._create(prompt, ANTHROPIC_SYSTEM_ARCHITECT)
+    
+    @retry_transient
+    def _create(self, prompt: str, system: List[Dict[str, Any]]) -> Dict[str, Any]:
         response = self.client.messages.create(
             model=self.model,
             max_tokens=4000,
             messages=[
                 {"role": "user", "content": prompt}
             ],
-            system="You are a senior software architect and code mentor. Provide actionable, specific suggestions for code improvement. Always respond with valid JSON."
+            system=system
         )
         
-        return json.loads(response.content[0].text)
-    
-    def _build_quality_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        Analyze the following {language} code for quality, best practices, and potential issues.
-        Provide a comprehensive analysis in JSON format with the following structure:
-        {{
-            "quality_score": <number between 0-100>,
-            "issues": [
-                {{
-                    "type": "error|warning|suggestion",
-                    "severity": "high|medium|low",
-                    "line": <line_number_or_null>,
-                    "message": "description of the issue",
-                    "suggestion": "how to fix it"
-                }}
-            ],
-            "metrics": {{
-                "complexity": "low|medium|high",
-                "maintainability": <number between 0-100>,
-                "readability": <number between 0-100>,
-                "security": <number between 0-100>
-            }},
-            "summary": "Overall summary of code quality",
-            "recommendations": [
-                "list of general recommendations for improvement"
-            ]
-        }}
-
-        Code to analyze:
-        {code_content}
-        """
-    
-    def _build_test_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        Generate comprehensive test cases for the following {language} code.
-        Provide the response in JSON format with the following structure:
-        {{
-            "test_framework": "recommended testing framework for {language}",
-            "test_cases": [
-                {{
-                    "name": "test case name",
-                    "description": "what this test validates",
-                    "type": "unit|integration|edge_case",
-                    "priority": "high|medium|low",
-                    "test_code": "actual test code implementation"
-                }}
-            ],
-            "coverage_suggestions": [
-                "areas that need more test coverage"
-            ],
-            "mocking_suggestions": [
-                "components that should be mocked and why"
-            ]
-        }}
-
-        Code to generate tests for:
-        {code_content}
-        """
-    
-    def _build_suggestions_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        Provide specific code improvement suggestions for the following {language} code.
-        Focus on performance, security, maintainability, and best practices.
-        Respond in JSON format:
-        {{
-            "refactoring_suggestions": [
-                {{
-                    "category": "performance|security|maintainability|style",
-                    "description": "what to improve",
-                    "before_code": "current problematic code snippet",
-                    "after_code": "improved code snippet",
-                    "explanation": "why this improvement matters"
-                }}
-            ],
-            "architecture_suggestions": [
-                "high-level architectural improvements"
-            ],
-            "dependency_suggestions": [
-                "library or framework recommendations"
-            ]
-        }}
-
-        Code to improve:
-        {code_content}
-        """
+        return orjson.loads(response.content[0].text)
 
-class GeminiProvider(AIProvider):
+class GeminiProvider(GeminiPromptMixin, AIProvider):
     """Google Gemini provider implementation"""
     
+    __slots__ = ()
+    
     def _initialize_client(self):
+        from google import genai
         return genai.Client(api_key=self.api_key)
     
+    def _prewarm(self):
+        self.client.models.get(model=self.model)
+    
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def analyze_code_quality(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_quality_prompt(code_content, language)
-        
-        response = self.client.models.generate_content(
-            model=self.model,
-            contents=prompt,
-            config=genai.types.GenerateContentConfig(
-                response_mime_type="application/json",
-                temperature=0.3
-            )
-        )
-        
-        return json.loads(response.text)
+        return self._generate(prompt, 0.3)
     
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def generate_test_cases(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_test_prompt(code_content, language)
-        
-        response = self.client.models.generate_content(
-            model=self.model,
-            contents=prompt,
-            config=genai.types.GenerateContentConfig(
-                response_mime_type="application/json",
-                temperature=0.4
-            )
-        )
-        
-        return json.loads(response.text)
+        return self._generate(prompt, 0.4)
     
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def get_code_suggestions(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_suggestions_prompt(code_content, language)
-        
+        return self._generate(prompt, 0.3)
+    
+    @retry_transient
+    def _generate(self, prompt: str, temperature: float) -> Dict[str, Any]:
+        from google.genai import types as genai_types
         response = self.client.models.generate_content(
             model=self.model,
             contents=prompt,
-            config=genai.types.GenerateContentConfig(
+            config=genai_types.GenerateContentConfig(
                 response_mime_type="application/json",
-                temperature=0.3
+                temperature=temperature
             )
         )
         
-        return json.loads(response.text)
-    
-    def _build_quality_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        You are an expert code reviewer and static analysis tool. Analyze the following {language} code for quality, best practices, and potential issues.
-        Provide a comprehensive analysis in JSON format with the following structure:
-        {{
-            "quality_score": <number between 0-100>,
-            "issues": [
-                {{
-                    "type": "error|warning|suggestion",
-                    "severity": "high|medium|low",
-                    "line": <line_number_or_null>,
-                    "message": "description of the issue",
-                    "suggestion": "how to fix it"
-                }}
-            ],
-            "metrics": {{
-                "complexity": "low|medium|high",
-                "maintainability": <number between 0-100>,
-                "readability": <number between 0-100>,
-                "security": <number between 0-100>
-            }},
-            "summary": "Overall summary of code quality",
-            "recommendations": [
-                "list of general recommendations for improvement"
-            ]
-        }}
-
-        Code to analyze:
-        {code_content}
-        """
-    
-    def _build_test_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        You are an expert test engineer. Generate comprehensive test cases for the following {language} code.
-        Provide the response in JSON format with the following structure:
-        {{
-            "test_framework": "recommended testing framework for {language}",
-            "test_cases": [
-                {{
-                    "name": "test case name",
-                    "description": "what this test validates",
-                    "type": "unit|integration|edge_case",
-                    "priority": "high|medium|low",
-                    "test_code": "actual test code implementation"
-                }}
-            ],
-            "coverage_suggestions": [
-                "areas that need more test coverage"
-            ],
-            "mocking_suggestions": [
-                "components that should be mocked and why"
-            ]
-        }}
+        return orjson.loads(response.text)
 
-        Code to generate tests for:
-        {code_content}
-        """
-    
-    def _build_suggestions_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        You are a senior software architect and code mentor. Provide specific code improvement suggestions for the following {language} code.
-        Focus on performance, security, maintainability, and best practices.
-        Respond in JSON format:
-        {{
-            "refactoring_suggestions": [
-                {{
-                    "category": "performance|security|maintainability|style",
-                    "description": "what to improve",
-                    "before_code": "current problematic code snippet",
-                    "after_code": "improved code snippet",
-                    "explanation": "why this improvement matters"
-                }}
-            ],
-            "architecture_suggestions": [
-                "high-level architectural improvements"
-            ],
-            "dependency_suggestions": [
-                "library or framework recommendations"
-            ]
-        }}
-
-        Code to improve:
-        {code_content}
-        """
-
-class PerplexityProvider(AIProvider):
+class PerplexityProvider(PromptMixin, AIProvider):
     """Perplexity provider implementation"""
     
+    __slots__ = ()
+    
     def _initialize_client(self):
-        return None  # Uses requests directly
+        return _SHARED_HTTP
     
+    def _prewarm(self):
+        self.client.head('https://api.perplexity.ai', timeout=5)
+    
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def analyze_code_quality(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_quality_prompt(code_content, language)
-        return self._make_request(prompt, "You are an expert code reviewer and static analysis tool. Provide detailed, actionable feedback on code quality, security, and best practices. Always respond with valid JSON.")
+        return self._make_request(prompt, SYS_REVIEWER_JSON)
     
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def generate_test_cases(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_test_prompt(code_content, language)
-        return self._make_request(prompt, "You are an expert test engineer. Generate comprehensive, practical test cases that follow testing best practices and cover edge cases. Always respond with valid JSON.")
+        return self._make_request(prompt, SYS_TESTER_JSON)
     
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def get_code_suggestions(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_suggestions_prompt(code_content, language)
-        return self._make_request(prompt, "You are a senior software architect and code mentor. Provide actionable, specific suggestions for code improvement. Always respond with valid JSON.")
+        return self._make_request(prompt, SYS_ARCHITECT_JSON)
     
-    def _make_request(self, prompt: str, system_message: str) -> Dict[str, Any]:
+    @retry_transient
+    def _make_request(self, prompt: str, system_message: Dict[str, str]) -> Dict[str, Any]:
         headers = {
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
@@ -618,273 +963,124 @@ class PerplexityProvider(AIProvider):
         data = {
             'model': self.model,
             'messages': [
-                {'role': 'system', 'content': system_message},
+                system_message,
                 {'role': 'user', 'content': prompt}
             ],
             'temperature': 0.3,
             'stream': False
         }
         
-        response = requests.post(
+        response = self.client.post(
             'https://api.perplexity.ai/chat/completions',
             headers=headers,
-            json=data
+            content=orjson.dumps(data),
+            timeout=REQUEST_TIMEOUT
         )
         
         if response.status_code == 200:
-            result = response.json()
-            return json.loads(result['choices'][0]['message']['content'])
+            result = orjson.loads(response.content)
+            return orjson.loads(result['choices'][0]['message']['content'])
         else:
-            raise Exception(f"Perplexity API error: {response.status_code} - {response.text}")
-    
-    def _build_quality_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        Analyze the following {language} code for quality, best practices, and potential issues.
-        Provide a comprehensive analysis in JSON format with the following structure:
-        {{
-            "quality_score": <number between 0-100>,
-            "issues": [
-                {{
-                    "type": "error|warning|suggestion",
-                    "severity": "high|medium|low",
-                    "line": <line_number_or_null>,
-                    "message": "description of the issue",
-                    "suggestion": "how to fix it"
-                }}
-            ],
-            "metrics": {{
-                "complexity": "low|medium|high",
-                "maintainability": <number between 0-100>,
-                "readability": <number between 0-100>,
-                "security": <number between 0-100>
-            }},
-            "summary": "Overall summary of code quality",
-            "recommendations": [
-                "list of general recommendations for improvement"
-            ]
-        }}
-
-        Code to analyze:
-        {code_content}
-        """
-    
-    def _build_test_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        Generate comprehensive test cases for the following {language} code.
-        Provide the response in JSON format with the following structure:
-        {{
-            "test_framework": "recommended testing framework for {language}",
-            "test_cases": [
-                {{
-                    "name": "test case name",
-                    "description": "what this test validates",
-                    "type": "unit|integration|edge_case",
-                    "priority": "high|medium|low",
-                    "test_code": "actual test code implementation"
-                }}
-            ],
-            "coverage_suggestions": [
-                "areas that need more test coverage"
-            ],
-            "mocking_suggestions": [
-                "components that should be mocked and why"
-            ]
-        }}
+            raise ProviderAPIError(f"Perplexity API error: {response.status_code} - {response.text}", response.status_code)
 
-        Code to generate tests for:
-        {code_content}
-        """
-    
-    def _build_suggestions_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        Provide specific code improvement suggestions for the following {language} code.
-        Focus on performance, security, maintainability, and best practices.
-        Respond in JSON format:
-        {{
-            "refactoring_suggestions": [
-                {{
-                    "category": "performance|security|maintainability|style",
-                    "description": "what to improve",
-                    "before_code": "current problematic code snippet",
-                    "after_code": "improved code snippet",
-                    "explanation": "why this improvement matters"
-                }}
-            ],
-            "architecture_suggestions": [
-                "high-level architectural improvements"
-            ],
-            "dependency_suggestions": [
-                "library or framework recommendations"
-            ]
-        }}
-
-        Code to improve:
-        {code_content}
-        """
-
-class XAIProvider(AIProvider):
+class XAIProvider(PromptMixin, AIProvider):
     """xAI (Grok) provider implementation using OpenAI-compatible API"""
     
+    __slots__ = ()
+    
     def _initialize_client(self):
+        from openai import OpenAI
         return OpenAI(
             api_key=self.api_key,
-            base_url="https://api.x.ai/v1"
+            base_url="https://api.x.ai/v1",
+            timeout=REQUEST_TIMEOUT,
+            max_retries=0,
+            http_client=_SHARED_HTTP
         )
     
+    def _prewarm(self):
+        self.client.models.list()
+    
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def analyze_code_quality(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_quality_prompt(code_content, language)
-        
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "You are an expert code reviewer and static analysis tool. Provide detailed, actionable feedback on code quality, security, and best practices."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.3
-        )
-        
-        return json.loads(response.choices[0].message.content)
+        return self._create(SYS_REVIEWER, prompt, 0.3)
     
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def generate_test_cases(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_test_prompt(code_content, language)
-        
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "You are an expert test engineer. Generate comprehensive, practical test cases that follow testing best practices and cover edge cases."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.4
-        )
-        
-        return json.loads(response.choices[0].message.content)
+        return self._create(SYS_TESTER, prompt, 0.4)
     
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def get_code_suggestions(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_suggestions_prompt(code_content, language)
-        
+        return self._create(SYS_ARCHITECT, prompt, 0.3)
+    
+    @retry_transient
+    def _create(self, system_message: Dict[str, str], prompt: str, temperature: float) -> Dict[str, Any]:
         response = self.client.chat.completions.create(
             model=self.model,
             messages=[
-                {"role": "system", "content": "You are a senior software architect and code mentor. Provide actionable, specific suggestions for code improvement."},
+                system_message,
                 {"role": "user", "content": prompt}
             ],
             response_format={"type": "json_object"},
-            temperature=0.3
+            temperature=temperature
         )
         
-        return json.loads(response.choices[0].message.content)
-    
-    def _build_quality_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        Analyze the following {language} code for quality, best practices, and potential issues.
-        Provide a comprehensive analysis in JSON format with the following structure:
-        {{
-            "quality_score": <number between 0-100>,
-            "issues": [
-                {{
-                    "type": "error|warning|suggestion",
-                    "severity": "high|medium|low",
-                    "line": <line_number_or_null>,
-                    "message": "description of the issue",
-                    "suggestion": "how to fix it"
-                }}
-            ],
-            "metrics": {{
-                "complexity": "low|medium|high",
-                "maintainability": <number between 0-100>,
-                "readability": <number between 0-100>,
-                "security": <number between 0-100>
-            }},
-            "summary": "Overall summary of code quality",
-            "recommendations": [
-                "list of general recommendations for improvement"
-            ]
-        }}
-
-        Code to analyze:
-        {code_content}
-        """
-    
-    def _build_test_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        Generate comprehensive test cases for the following {language} code.
-        Provide the response in JSON format with the following structure:
-        {{
-            "test_framework": "recommended testing framework for {language}",
-            "test_cases": [
-                {{
-                    "name": "test case name",
-                    "description": "what this test validates",
-                    "type": "unit|integration|edge_case",
-                    "priority": "high|medium|low",
-                    "test_code": "actual test code implementation"
-                }}
-            ],
-            "coverage_suggestions": [
-                "areas that need more test coverage"
-            ],
-            "mocking_suggestions": [
-                "components that should be mocked and why"
-            ]
-        }}
-
-        Code to generate tests for:
-        {code_content}
-        """
-    
-    def _build_suggestions_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        Provide specific code improvement suggestions for the following {language} code.
-        Focus on performance, security, maintainability, and best practices.
-        Respond in JSON format:
-        {{
-            "refactoring_suggestions": [
-                {{
-                    "category": "performance|security|maintainability|style",
-                    "description": "what to improve",
-                    "before_code": "current problematic code snippet",
-                    "after_code": "improved code snippet",
-                    "explanation": "why this improvement matters"
-                }}
-            ],
-            "architecture_suggestions": [
-                "high-level architectural improvements"
-            ],
-            "dependency_suggestions": [
-                "library or framework recommendations"
-            ]
-        }}
-
-        Code to improve:
-        {code_content}
-        """
+        return orjson.loads(response.choices[0].message.content)
 
-class HTTPProvider(AIProvider):
+class HTTPProvider(PromptMixin, AIProvider):
     """Generic HTTP provider for APIs that use standard HTTP requests"""
     
+    __slots__ = ('base_url', 'headers')
+    
     def __init__(self, api_key: str, model: str, base_url: str, headers: Dict[str, str] = None):
         self.base_url = base_url
         self.headers = headers or {}
         super().__init__(api_key, model)
     
     def _initialize_client(self):
-        return None  # Uses requests directly
+        return _SHARED_HTTP
+    
+    def _prewarm(self):
+        self.client.head(self.base_url, timeout=5)
     
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def analyze_code_quality(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_quality_prompt(code_content, language)
-        return self._make_request(prompt, "You are an expert code reviewer. Analyze the code and provide detailed feedback in JSON format.")
+        return self._make_request(prompt, SYS_REVIEWER_JSON)
     
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def generate_test_cases(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_test_prompt(code_content, language)
-        return self._make_request(prompt, "You are a test engineer. Generate comprehensive test cases in JSON format.")
+        return self._make_request(prompt, SYS_TESTER_JSON)
     
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
     def get_code_suggestions(self, code_content: str, language: str) -> Dict[str, Any]:
         prompt = self._build_suggestions_prompt(code_content, language)
-        return self._make_request(prompt, "You are a senior developer. Provide code improvement suggestions in JSON format.")
+        return self._make_request(prompt, SYS_ARCHITECT_JSON)
     
-    def _make_request(self, prompt: str, system_message: str) -> Dict[str, Any]:
+    @retry_transient
+    def _make_request(self, prompt: str, system_message: Dict[str, str]) -> Dict[str, Any]:
         headers = {
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json',
@@ -894,250 +1090,345 @@ class HTTPProvider(AIProvider):
         data = {
             'model': self.model,
             'messages': [
-                {'role': 'system', 'content': system_message},
+                system_message,
                 {'role': 'user', 'content': prompt}
             ],
             'temperature': 0.3,
             'max_tokens': 4000
         }
         
-        response = requests.post(f"{self.base_url}/chat/completions", headers=headers, json=data, timeout=60)
+        response = self.client.post(f"{self.base_url}/chat/completions", headers=headers, content=orjson.dumps(data), timeout=REQUEST_TIMEOUT)
         
         if response.status_code == 200:
-            result = response.json()
+            result = orjson.loads(response.content)
             content = result['choices'][0]['message']['content']
             try:
-                return json.loads(content)
-            except json.JSONDecodeError:
+                return orjson.loads(content)
+            except orjson.JSONDecodeError:
                 # Fallback for non-JSON responses
                 return {"error": "Invalid JSON response", "content": content}
         else:
-            raise Exception(f"API error: {response.status_code} - {response.text}")
+            raise ProviderAPIError(f"API error: {response.status_code} - {response.text}", response.status_code)
+
+class LoadBalancedProvider(AIProvider):
+    """Spreads calls across several configured providers (or API keys).
+
+    Throughput against hosted LLMs is bounded by per-key rate limits, so
+    multiplexing over N backends gives roughly N times the headroom. Backends
+    that answer with a rate-limit error are benched for a cool-down window and
+    the call is retried on the next candidate.
+    """
+
+    __slots__ = ('providers', 'strategy', 'cooldown', '_latency', '_inflight', '_hot_until', '_lock')
+
+    STRATEGIES = ('round_robin', 'least_latency', 'least_inflight')
+
+    def __init__(self, providers: List[AIProvider], strategy: str = 'least_latency', cooldown: float = 30.0):
+        if not providers:
+            raise ValueError("LoadBalancedProvider needs at least one provider")
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unsupported load balancing strategy: {strategy}")
+        self.providers = deque(providers)
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self._latency = {id(p): 0.0 for p in providers}  # EWMA of call duration in seconds
+        self._inflight = {id(p): 0 for p in providers}
+        self._hot_until = {id(p): 0.0 for p in providers}
+        self._lock = threading.Lock()
+        # No client of its own (and nothing to pre-warm): calls go to the wrapped providers
+        self.api_key = None
+        self.model = ','.join(p.model for p in providers)
+        self.client = None
+
+    def _initialize_client(self):
+        return None
+
+    def analyze_code_quality(self, code_content: str, language: str) -> Dict[str, Any]:
+        return self._dispatch('analyze_code_quality', code_content, language)
+
+    def generate_test_cases(self, code_content: str, language: str) -> Dict[str, Any]:
+        return self._dispatch('generate_test_cases', code_content, language)
+
+    def get_code_suggestions(self, code_content: str, language: str) -> Dict[str, Any]:
+        return self._dispatch('get_code_suggestions', code_content, language)
+
+    def _pick(self, exclude: set) -> AIProvider:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [p for p in self.providers if id(p) not in exclude]
+            cool = [p for p in candidates if self._hot_until[id(p)] <= now]
+            candidates = cool or candidates
+
+            if self.strategy == 'round_robin':
+                for _ in range(len(self.providers)):
+                    provider = self.providers[0]
+                    self.providers.rotate(-1)
+                    if provider in candidates:
+                        break
+            elif self.strategy == 'least_inflight':
+                provider = min(candidates, key=lambda p: (self._inflight[id(p)], self._latency[id(p)]))
+            else:
+                provider = min(candidates, key=lambda p: self._latency[id(p)])
+
+            self._inflight[id(provider)] += 1
+            return provider
+
+    def _dispatch(self, method_name: str, code_content: str, language: str) -> Dict[str, Any]:
+        tried = set()
+        last_error = None
+        while len(tried) < len(self.providers):
+            provider = self._pick(tried)
+            tried.add(id(provider))
+            start = time.monotonic()
+            try:
+                result = getattr(provider, method_name)(code_content, language)
+            except Exception as e:
+                if not _is_rate_limited(e):
+                    raise
+                with self._lock:
+                    self._hot_until[id(provider)] = time.monotonic() + self.cooldown
+                last_error = e
+                continue
+            finally:
+                with self._lock:
+                    self._inflight[id(provider)] -= 1
+
+            elapsed = time.monotonic() - start
+            with self._lock:
+                previous = self._latency[id(provider)]
+                self._latency[id(provider)] = elapsed if previous == 0.0 else 0.8 * previous + 0.2 * elapsed
+            return result
+
+        raise last_error
+
+def _is_rate_limited(error: Exception) -> bool:
+    """Whether an exception raised by a provider call signals HTTP 429"""
+    return _error_status_code(error) == 429
+
+# Endpoints of the providers served by the generic OpenAI-compatible HTTP client
+HTTP_PROVIDER_BASE_URLS = {
+    'cohere': "https://api.cohere.ai/v1",
+    'mistral': "https://api.mistral.ai/v1",
+    'huggingface': "https://api-inference.huggingface.co/models",
+    'together': "https://api.together.xyz/v1"
+}
+
+# Hosts reached through the shared pool, warmed once at process startup
+PROVIDER_ENDPOINTS = MappingProxyType({
+    'openai': "https://api.openai.com/v1",
+    'anthropic': "https://api.anthropic.com",
+    'perplexity': "https://api.perplexity.ai",
+    'xai': "https://api.x.ai/v1",
+    **HTTP_PROVIDER_BASE_URLS
+})
+
+def _prewarm_endpoints(urls: Tuple[str, ...]) -> None:
+    for url in urls:
+        try:
+            _SHARED_HTTP.head(url, timeout=5)
+        except httpx.HTTPError as e:
+            logger.debug("Connection pre-warm for %s failed: %s", url, e)
+
+def prewarm_endpoints() -> None:
+    """Open keep-alive connections to every provider endpoint in a background thread"""
+    if not PREWARM_CONNECTIONS:
+        return
+    urls = tuple(PROVIDER_ENDPOINTS.values())
+    threading.Thread(target=_prewarm_endpoints, args=(urls,), daemon=True).start()
+
+# Factory function to create AI providers
+# provider -> callable(api_key, model) building its sync provider
+_PROVIDER_FACTORIES = MappingProxyType({
+    'openai': OpenAIProvider,
+    'anthropic': AnthropicProvider,
+    'gemini': GeminiProvider,
+    'perplexity': PerplexityProvider,
+    'xai': XAIProvider,
+    **{
+        provider_name: functools.partial(HTTPProvider, base_url=base_url)
+        for provider_name, base_url in HTTP_PROVIDER_BASE_URLS.items()
+    }
+})
+
+def create_ai_provider(provider_name: str, api_key: str, model: str, async_: bool = False):
+    """Factory function to create AI provider instances (AsyncAIProvider instances with async_=True)"""
     
-    def _build_quality_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        Analyze the following {language} code for quality, best practices, and potential issues.
-        Provide a comprehensive analysis in JSON format with the following structure:
-        {{
-            "quality_score": <number between 0-100>,
-            "issues": [
-                {{
-                    "type": "error|warning|suggestion",
-                    "severity": "high|medium|low",
-                    "line": <line_number_or_null>,
-                    "message": "description of the issue",
-                    "suggestion": "how to fix it"
-                }}
-            ],
-            "metrics": {{
-                "complexity": "low|medium|high",
-                "maintainability": <number between 0-100>,
-                "readability": <number between 0-100>,
-                "security": <number between 0-100>
-            }},
-            "summary": "Overall summary of code quality",
-            "recommendations": [
-                "list of general recommendations for improvement"
-            ]
-        }}
-
-        Code to analyze:
-        {code_content}
-        """
+    if async_:
+        from async_ai_service import create_async_ai_provider
+        return create_async_ai_provider(provider_name, api_key, model)
     
-    def _build_test_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        Generate comprehensive test cases for the following {language} code.
-        Provide the response in JSON format with the following structure:
-        {{
-            "test_framework": "recommended testing framework for {language}",
-            "test_cases": [
-                {{
-                    "name": "test case name",
-                    "description": "what this test validates",
-                    "type": "unit|integration|edge_case",
-                    "priority": "high|medium|low",
-                    "test_code": "actual test code implementation"
-                }}
-            ],
-            "coverage_suggestions": [
-                "areas that need more test coverage"
-            ],
-            "mocking_suggestions": [
-                "components that should be mocked and why"
-            ]
-        }}
+    try:
+        factory = _PROVIDER_FACTORIES[provider_name]
+    except KeyError:
+        raise ValueError(f"Unsupported AI provider: {provider_name}") from None
+    return factory(api_key, model)
 
-        Code to generate tests for:
-        {code_content}
-        """
-    
-    def _build_suggestions_prompt(self, code_content: str, language: str) -> str:
-        return f"""
-        Provide specific code improvement suggestions for the following {language} code.
-        Focus on performance, security, maintainability, and best practices.
-        Respond in JSON format:
-        {{
-            "refactoring_suggestions": [
-                {{
-                    "category": "performance|security|maintainability|style",
-                    "description": "what to improve",
-                    "before_code": "current problematic code snippet",
-                    "after_code": "improved code snippet",
-                    "explanation": "why this improvement matters"
-                }}
-            ],
-            "architecture_suggestions": [
-                "high-level architectural improvements"
-            ],
-            "dependency_suggestions": [
-                "library or framework recommendations"
-            ]
-        }}
+# Import names for requirements whose distribution name differs from the module
+_REQUIREMENT_MODULES = {'google-genai': 'google.genai'}
 
-        Code to improve:
-        {code_content}
-        """
+@functools.lru_cache(maxsize=None)
+def _module_installed(module_name: str) -> bool:
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except ModuleNotFoundError:
+        return False
 
-# Factory function to create AI providers
-def create_ai_provider(provider_name: str, api_key: str, model: str) -> AIProvider:
-    """Factory function to create AI provider instances"""
-    
-    if provider_name == 'openai':
-        return OpenAIProvider(api_key, model)
-    elif provider_name == 'anthropic':
-        return AnthropicProvider(api_key, model)
-    elif provider_name == 'gemini':
-        return GeminiProvider(api_key, model)
-    elif provider_name == 'perplexity':
-        return PerplexityProvider(api_key, model)
-    elif provider_name == 'xai':
-        return XAIProvider(api_key, model)
-    elif provider_name == 'cohere':
-        return HTTPProvider(api_key, model, "https://api.cohere.ai/v1")
-    elif provider_name == 'mistral':
-        return HTTPProvider(api_key, model, "https://api.mistral.ai/v1")
-    elif provider_name == 'huggingface':
-        return HTTPProvider(api_key, model, "https://api-inference.huggingface.co/models")
-    elif provider_name == 'together':
-        return HTTPProvider(api_key, model, "https://api.together.xyz/v1")
-    else:
-        raise ValueError(f"Unsupported AI provider: {provider_name}")
-
-def get_available_providers() -> Dict[str, Dict]:
-    """Get list of available AI providers and their models"""
-    return AI_PROVIDERS
+def is_available(provider_key: str) -> bool:
+    """Whether the client libraries a provider needs are installed (without importing them)"""
+    spec = PROVIDERS.get(provider_key)
+    if spec is None:
+        return False
+    return all(
+        _module_installed(_REQUIREMENT_MODULES.get(requirement, requirement))
+        for requirement in spec.requires
+    )
+
+@functools.lru_cache(maxsize=None)
+def get_available_providers() -> Mapping[str, ProviderSpec]:
+    """AI providers whose client libraries are installed, and their models"""
+    return MappingProxyType({key: spec for key, spec in PROVIDERS.items() if is_available(key)})
+
+def _bearer(api_key: str) -> Dict[str, str]:
+    return {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
+
+def _anthropic_headers(api_key: str) -> Dict[str, str]:
+    return {'x-api-key': api_key, 'anthropic-version': '2023-06-01', 'Content-Type': 'application/json'}
+
+def _gemini_headers(api_key: str) -> Dict[str, str]:
+    return {'x-goog-api-key': api_key, 'Content-Type': 'application/json'}
+
+# provider -> (method, URL, auth headers, JSON body) of the cheapest call that fails on a bad key
+_KEY_PROBES = MappingProxyType({
+    'openai': ('GET', 'https://api.openai.com/v1/models', _bearer, None),
+    'anthropic': ('POST', 'https://api.anthropic.com/v1/messages', _anthropic_headers, {
+        'model': 'claude-3-haiku-20240307',
+        'max_tokens': 1,
+        'messages': [{'role': 'user', 'content': 'Hi'}]
+    }),
+    'gemini': ('POST', 'https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent', _gemini_headers, {
+        'contents': [{'parts': [{'text': 'Test'}]}],
+        'generationConfig': {'maxOutputTokens': 1}
+    }),
+    'perplexity': ('POST', 'https://api.perplexity.ai/chat/completions', _bearer, {
+        'model': 'llama-3.1-sonar-small-128k-online',
+        'messages': [{'role': 'user', 'content': 'Test'}],
+        'max_tokens': 1
+    }),
+    'xai': ('GET', 'https://api.x.ai/v1/models', _bearer, None),
+    'cohere': ('POST', 'https://api.cohere.ai/v1/generate', _bearer, {
+        'model': 'command',
+        'message': 'Test',
+        'max_tokens': 1
+    }),
+    'mistral': ('POST', 'https://api.mistral.ai/v1/chat/completions', _bearer, {
+        'model': 'mistral-small-latest',
+        'messages': [{'role': 'user', 'content': 'Test'}],
+        'max_tokens': 1
+    }),
+    'huggingface': ('POST', 'https://api-inference.huggingface.co/models/microsoft/DialoGPT-large', _bearer, {
+        'inputs': 'Test'
+    }),
+    'together': ('POST', 'https://api.together.xyz/v1/chat/completions', _bearer, {
+        'model': 'meta-llama/Llama-2-7b-chat-hf',
+        'messages': [{'role': 'user', 'content': 'Test'}],
+        'max_tokens': 1
+    })
+})
+
+def _key_probe(provider: str, api_key: str) -> Optional[Dict[str, Any]]:
+    """Request arguments for checking a provider's key, or None for unknown providers"""
+    probe = _KEY_PROBES.get(provider)
+    if probe is None:
+        return None
+    method, url, headers, body = probe
+    request_args = {'method': method, 'url': url, 'headers': headers(api_key)}
+    if body is not None:
+        request_args['json'] = body
+    return request_args
 
 def validate_api_key(provider: str, api_key: str) -> bool:
     """Validate API key for a given provider"""
+    probe = _key_probe(provider, api_key)
+    if probe is None:
+        return False
     try:
-        if provider == 'openai':
-            client = OpenAI(api_key=api_key)
-            client.models.list()
-        elif provider == 'anthropic':
-            client = anthropic.Anthropic(api_key=api_key)
-            client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=1,
-                messages=[{"role": "user", "content": "Hi"}]
-            )
-        elif provider == 'gemini':
-            client = genai.Client(api_key=api_key)
-            client.models.generate_content(
-                model="gemini-1.5-flash",
-                contents="Test"
-            )
-        elif provider == 'perplexity':
-            headers = {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
-            data = {
-                'model': 'llama-3.1-sonar-small-128k-online',
-                'messages': [{'role': 'user', 'content': 'Test'}],
-                'max_tokens': 1
-            }
-            response = requests.post('https://api.perplexity.ai/chat/completions', headers=headers, json=data)
-            response.raise_for_status()
-        elif provider == 'xai':
-            client = OpenAI(api_key=api_key, base_url="https://api.x.ai/v1")
-            client.models.list()
-        elif provider == 'cohere':
-            headers = {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
-            data = {
-                'model': 'command',
-                'message': 'Test',
-                'max_tokens': 1
-            }
-            response = requests.post('https://api.cohere.ai/v1/generate', headers=headers, json=data)
-            response.raise_for_status()
-        elif provider == 'mistral':
-            headers = {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
-            data = {
-                'model': 'mistral-small-latest',
-                'messages': [{'role': 'user', 'content': 'Test'}],
-                'max_tokens': 1
-            }
-            response = requests.post('https://api.mistral.ai/v1/chat/completions', headers=headers, json=data)
-            response.raise_for_status()
-        elif provider == 'huggingface':
-            headers = {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
-            data = {'inputs': 'Test'}
-            response = requests.post('https://api-inference.huggingface.co/models/microsoft/DialoGPT-large', 
-                                   headers=headers, json=data)
-            response.raise_for_status()
-        elif provider == 'together':
-            headers = {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
-            data = {
-                'model': 'meta-llama/Llama-2-7b-chat-hf',
-                'messages': [{'role': 'user', 'content': 'Test'}],
-                'max_tokens': 1
-            }
-            response = requests.post('https://api.together.xyz/v1/chat/completions', headers=headers, json=data)
-            response.raise_for_status()
-        else:
-            return False
-        
+        response = _SHARED_HTTP.request(**probe, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
         return True
-    except Exception:
+    except httpx.HTTPError:
         return False
 
+# Extension -> language, built once per process
+_EXT_MAP = MappingProxyType({
+    '.py': 'python',
+    '.js': 'javascript',
+    '.ts': 'typescript',
+    '.java': 'java',
+    '.cpp': 'cpp',
+    '.c': 'c',
+    '.cs': 'csharp',
+    '.php': 'php',
+    '.rb': 'ruby',
+    '.go': 'go',
+    '.rs': 'rust',
+    '.swift': 'swift',
+    '.kt': 'kotlin',
+    '.scala': 'scala',
+    '.sh': 'bash',
+    '.sql': 'sql',
+    '.html': 'html',
+    '.css': 'css',
+    '.json': 'json',
+    '.xml': 'xml',
+    '.yaml': 'yaml',
+    '.yml': 'yaml'
+})
+
+# Content detection only inspects this many characters from the start of a
+# file, and uploads read no more than this many bytes for it
+LANGUAGE_DETECTION_LIMIT = 64 * 1024
+
+# Content markers used when the extension is unknown, compiled into one pattern
+_CONTENT_MARKERS = {
+    'py_def': 'def ',
+    'py_import': 'import ',
+    'js_function': 'function ',
+    'js_var': 'var ',
+    'js_let': 'let ',
+    'java_class': 'public class ',
+    'java_main': 'public static void main'
+}
+_CONTENT_MARKER_RE = re.compile('|'.join(
+    f'(?P<{name}>{re.escape(marker)})' for name, marker in _CONTENT_MARKERS.items()
+))
+
+# Checked in order; a language matches when all markers of any one alternative occur
+_PYTHON_MARKERS = frozenset({'py_def', 'py_import'})
+_CONTENT_RULES = (
+    ('python', (_PYTHON_MARKERS,)),
+    ('javascript', (frozenset({'js_function', 'js_var'}), frozenset({'js_function', 'js_let'}))),
+    ('java', (frozenset({'java_class', 'java_main'}),))
+)
+
 def detect_language(filename: str, code_content: str) -> str:
     """Detect programming language from filename and content"""
-    extension_map = {
-        '.py': 'python',
-        '.js': 'javascript',
-        '.ts': 'typescript',
-        '.java': 'java',
-        '.cpp': 'cpp',
-        '.c': 'c',
-        '.cs': 'csharp',
-        '.php': 'php',
-        '.rb': 'ruby',
-        '.go': 'go',
-        '.rs': 'rust',
-        '.swift': 'swift',
-        '.kt': 'kotlin',
-        '.scala': 'scala',
-        '.sh': 'bash',
-        '.sql': 'sql',
-        '.html': 'html',
-        '.css': 'css',
-        '.json': 'json',
-        '.xml': 'xml',
-        '.yaml': 'yaml',
-        '.yml': 'yaml'
-    }
 
-    # Get extension from filename
-    ext = os.path.splitext(filename.lower())[1]
-    detected_language = extension_map.get(ext, 'text')
+    # Get extension from filename; only the extension needs lowercasing
+    ext = os.path.splitext(filename)[1].lower()
+    detected_language = _EXT_MAP.get(ext, 'text')
 
     # If we can't detect from extension, try to detect from content
     if detected_language == 'text' and code_content:
-        # Simple heuristics for common languages
-        if 'def ' in code_content and 'import ' in code_content:
-            detected_language = 'python'
-        elif 'function ' in code_content and ('var ' in code_content or 'let ' in code_content):
-            detected_language = 'javascript'
-        elif 'public class ' in code_content and 'public static void main' in code_content:
-            detected_language = 'java'
+        # One regex pass collects which markers occur, instead of one scan per marker
+        seen = set()
+        for match in _CONTENT_MARKER_RE.finditer(code_content, 0, LANGUAGE_DETECTION_LIMIT):
+            seen.add(match.lastgroup)
+            if _PYTHON_MARKERS <= seen:
+                # Python is checked first, so nothing later can change the answer
+                break
+        for language, alternatives in _CONTENT_RULES:
+            if any(markers <= seen for markers in alternatives):
+                detected_language = language
+                break
 
     return detected_language
\ No newline at end of file
@@ -1,7 +1,11 @@
 import os
 import logging
+import decimal
+import orjson
 from flask import Flask
+from flask.json.provider import JSONProvider
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Text, inspect, text
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 
@@ -13,8 +17,35 @@ class Base(DeclarativeBase):
 
 db = SQLAlchemy(model_class=Base)
 
+def _orjson_default(obj):
+    # The types Flask's default provider handles that orjson does not
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class OrjsonProvider(JSONProvider):
+    """JSON for jsonify, request.get_json and the tojson filter, encoded by orjson"""
+
+    def _encode(self, obj, sort_keys=False):
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=_orjson_default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        return self._encode(obj, kwargs.get('sort_keys', False)).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes to the response without a round trip through str
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj), mimetype="application/json")
+
 # Create the app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-for-development")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
@@ -23,7 +54,16 @@ app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:/
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_recycle": 300,
     "pool_pre_ping": True,
+    "json_serializer": lambda obj: orjson.dumps(obj).decode(),
+    "json_deserializer": orjson.loads,
 }
+if not app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+    # One connection per request thread of a gunicorn worker (see gunicorn.conf.py)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"].update(
+        pool_size=int(os.environ.get("DB_POOL_SIZE", 20)),
+        max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", 12)),
+        pool_timeout=int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+    )
 
 # Configure upload settings
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
@@ -32,6 +72,16 @@ app.config['UPLOAD_FOLDER'] = 'uploads'
 # Initialize the app with the extension
 db.init_app(app)
 
+def upgrade_json_columns():
+    """Convert result columns created as TEXT to JSONB in place (PostgreSQL only)"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    columns = {column['name']: column['type'] for column in inspect(db.engine).get_columns('code_analysis')}
+    with db.engine.begin() as connection:
+        for name in ('analysis_result', 'test_suggestions'):
+            if isinstance(columns.get(name), Text):
+                connection.execute(text(f'ALTER TABLE code_analysis ALTER COLUMN {name} TYPE JSONB USING {name}::jsonb'))
+
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
@@ -39,6 +89,15 @@ with app.app_context():
     # Import models to ensure tables are created
     import models
     db.create_all()
+    upgrade_json_columns()
+    # create_all skips tables that already exist, so add any indexes declared since
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
 
 # Import routes after app initialization
 import routes
+
+# Seed the shared provider connection pool before the first analysis
+from ai_service import prewarm_endpoints
+prewarm_endpoints()
@@ -0,0 +1,612 @@
+import asyncio
+import functools
+import time
+from abc import ABC, abstractmethod
+from types import MappingProxyType
+from typing import AsyncIterator, Callable, Dict, Any, List, Tuple
+
+import httpx
+import orjson
+
+from ai_service import (
+    PromptMixin, AnthropicPromptMixin, GeminiPromptMixin, StructuredOutputMixin,
+    ANALYSIS_METHODS, HTTP2_AVAILABLE, HTTP_PROVIDER_BASE_URLS, REQUEST_TIMEOUT, STREAM_TASKS, STREAM_UPDATE_INTERVAL, ProviderAPIError, preflight, preflight_response, retry_transient, _key_probe,
+    SYS_REVIEWER, SYS_TESTER, SYS_ARCHITECT,
+    SYS_REVIEWER_JSON, SYS_TESTER_JSON, SYS_ARCHITECT_JSON,
+    ANTHROPIC_SYSTEM_REVIEWER, ANTHROPIC_SYSTEM_TESTER, ANTHROPIC_SYSTEM_ARCHITECT
+)
+from code_chunks import map_reduce
+from llm_cache import llm_cache
+from partial_json import JSONDocumentEnd, parse_partial_json
+from rate_limiter import rate_limited
+
+# Async SDK clients are imported lazily by the providers that need them
+
+
+def _sdk_http_client() -> httpx.AsyncClient:
+    """Connection pool for an async SDK client; HTTP/2 multiplexes its concurrent calls over one connection"""
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=30.0),
+        timeout=httpx.Timeout(120.0, connect=5.0)
+    )
+
+
+async def _partial_reports(deltas: AsyncIterator[str],
+                           decode: Callable[[str], Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    """Yield a parsed snapshot at most every STREAM_UPDATE_INTERVAL as the JSON grows, then the decoded full report"""
+    parts = []
+    last = None
+    next_update = 0.0
+    document = JSONDocumentEnd()
+    async for delta in deltas:
+        if document.complete:
+            if delta.strip():
+                # The model kept writing past the report; stop paying for it
+                break
+            continue
+        end = document.feed(delta)
+        parts.append(delta if end < 0 else delta[:end])
+        now = time.monotonic()
+        if now < next_update:
+            continue
+        next_update = now + STREAM_UPDATE_INTERVAL
+        partial = parse_partial_json(''.join(parts))
+        if isinstance(partial, dict) and partial != last:
+            last = partial
+            yield partial
+    yield decode(''.join(parts))
+
+
+async def _read_document(deltas: AsyncIterator[str]) -> str:
+    """Join streamed deltas up to the end of the JSON document, cutting off any text the model adds after it"""
+    parts = []
+    document = JSONDocumentEnd()
+    async for delta in deltas:
+        if document.complete:
+            if delta.strip():
+                break
+            continue
+        end = document.feed(delta)
+        parts.append(delta if end < 0 else delta[:end])
+    return ''.join(parts)
+
+
+class AsyncAIProvider(ABC):
+    """Abstract base class for async AI providers.
+
+    Mirrors AIProvider method for method, but every remote call is awaitable so
+    the three analyses for a file (or many files) can be issued concurrently.
+    """
+
+    def __init__(self, api_key: str, model: str):
+        self.api_key = api_key
+        self.model = model
+        self.client = self._initialize_client()
+
+    @abstractmethod
+    def _initialize_client(self):
+        """Initialize the async AI client"""
+        pass
+
+    @abstractmethod
+    async def analyze_code_quality(self, code_content: str, language: str) -> Dict[str, Any]:
+        """Analyze code quality"""
+        pass
+
+    @abstractmethod
+    async def generate_test_cases(self, code_content: str, language: str) -> Dict[str, Any]:
+        """Generate test cases"""
+        pass
+
+    @abstractmethod
+    async def get_code_suggestions(self, code_content: str, language: str) -> Dict[str, Any]:
+        """Get code improvement suggestions"""
+        pass
+
+    async def stream_analyze_code_quality(self, code_content: str, language: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield partial quality reports as the response streams; the last one is complete"""
+        async for report in self._stream_checked('quality', code_content, language):
+            yield report
+
+    async def stream_generate_test_cases(self, code_content: str, language: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield partial test reports as the response streams; the last one is complete"""
+        async for report in self._stream_checked('tests', code_content, language):
+            yield report
+
+    async def stream_get_code_suggestions(self, code_content: str, language: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield partial suggestion reports as the response streams; the last one is complete"""
+        async for report in self._stream_checked('suggestions', code_content, language):
+            yield report
+
+    async def _stream_checked(self, report: str, code_content: str, language: str) -> AsyncIterator[Dict[str, Any]]:
+        method_name, _, _ = STREAM_TASKS[report]
+        direct = preflight_response(method_name, code_content)
+        if direct is not None:
+            yield direct
+            return
+        async for partial in self._stream(report, code_content, language):
+            yield partial
+
+    async def _stream(self, report: str, code_content: str, language: str) -> AsyncIterator[Dict[str, Any]]:
+        # Providers without a streaming implementation yield the finished report once
+        method_name, _, _ = STREAM_TASKS[report]
+        yield await getattr(self, method_name)(code_content, language)
+
+    def _stream_prompt(self, report: str, code_content: str, language: str) -> Tuple[str, float]:
+        _, builder_name, temperature = STREAM_TASKS[report]
+        return getattr(self, builder_name)(code_content, language), temperature
+
+    async def analyze_all(self, code_content: str, language: str) -> Dict[str, Dict[str, Any]]:
+        """Run quality analysis, test generation and suggestions concurrently, keyed by method name"""
+        results = await analyze_all(self, code_content, language)
+        return dict(zip(ANALYSIS_METHODS, results))
+
+    async def aclose(self):
+        """Close the underlying client and its connection pool"""
+        close = getattr(self.client, 'close', None)
+        if close is not None:
+            await close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+_OPENAI_SYSTEM_MESSAGES = {'quality': SYS_REVIEWER, 'tests': SYS_TESTER, 'suggestions': SYS_ARCHITECT}
+_JSON_SYSTEM_MESSAGES = {'quality': SYS_REVIEWER_JSON, 'tests': SYS_TESTER_JSON, 'suggestions': SYS_ARCHITECT_JSON}
+_ANTHROPIC_SYSTEM_BLOCKS = {'quality': ANTHROPIC_SYSTEM_REVIEWER, 'tests': ANTHROPIC_SYSTEM_TESTER, 'suggestions': ANTHROPIC_SYSTEM_ARCHITECT}
+
+
+class AsyncOpenAIProvider(StructuredOutputMixin, AsyncAIProvider):
+    """Async OpenAI provider implementation"""
+
+    def _initialize_client(self):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=self.api_key, timeout=REQUEST_TIMEOUT, max_retries=0, http_client=_sdk_http_client())
+
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    async def analyze_code_quality(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_quality_prompt(code_content, language)
+        return await self._complete('quality', prompt, 0.3)
+
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    async def generate_test_cases(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_test_prompt(code_content, language)
+        return await self._complete('tests', prompt, 0.4)
+
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    async def get_code_suggestions(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_suggestions_prompt(code_content, language)
+        return await self._complete('suggestions', prompt, 0.3)
+
+    async def _open_stream(self, report: str, prompt: str, temperature: float):
+        return await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                _OPENAI_SYSTEM_MESSAGES[report],
+                {"role": "user", "content": prompt}
+            ],
+            response_format=self._response_format(report),
+            temperature=temperature,
+            stream=True
+        )
+
+    @staticmethod
+    async def _deltas(stream) -> AsyncIterator[str]:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    @retry_transient
+    async def _complete(self, report: str, prompt: str, temperature: float) -> Dict[str, Any]:
+        # Streamed so anything the model writes after the report's JSON is cut off unread
+        async with await self._open_stream(report, prompt, temperature) as stream:
+            content = await _read_document(self._deltas(stream))
+        return self._decode_response(content, report)
+
+    async def _stream(self, report: str, code_content: str, language: str) -> AsyncIterator[Dict[str, Any]]:
+        prompt, temperature = self._stream_prompt(report, code_content, language)
+        async with await self._open_stream(report, prompt, temperature) as stream:
+            async for partial in _partial_reports(self._deltas(stream), lambda content: self._decode_response(content, report)):
+                yield partial
+
+
+class AsyncXAIProvider(AsyncOpenAIProvider):
+    """Async xAI (Grok) provider implementation using OpenAI-compatible API"""
+
+    def _initialize_client(self):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(
+            api_key=self.api_key,
+            base_url="https://api.x.ai/v1",
+            timeout=REQUEST_TIMEOUT,
+            max_retries=0,
+            http_client=_sdk_http_client()
+        )
+
+
+class AsyncAnthropicProvider(AnthropicPromptMixin, AsyncAIProvider):
+    """Async Anthropic provider implementation"""
+
+    def _initialize_client(self):
+        import anthropic
+        return anthropic.AsyncAnthropic(api_key=self.api_key, timeout=REQUEST_TIMEOUT, max_retries=0, http_client=_sdk_http_client())
+
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    async def analyze_code_quality(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_quality_prompt(code_content, language)
+        return await self._create(prompt, ANTHROPIC_SYSTEM_REVIEWER)
+
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    async def generate_test_cases(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_test_prompt(code_content, language)
+        return await self._create(prompt, ANTHROPIC_SYSTEM_TESTER)
+
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    async def get_code_suggestions(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_suggestions_prompt(code_content, language)
+        return await self._create(prompt, ANTHROPIC_SYSTEM_ARCHITECT)
+
+    @retry_transient
+    async def _create(self, prompt: str, system: List[Dict[str, Any]]) -> Dict[str, Any]:
+        response = await self.client.messages.create(
+            model=self.model,
+            max_tokens=4000,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            system=system
+        )
+
+        return orjson.loads(response.content[0].text)
+
+    async def _stream(self, report: str, code_content: str, language: str) -> AsyncIterator[Dict[str, Any]]:
+        prompt, _ = self._stream_prompt(report, code_content, language)
+        async with self.client.messages.stream(
+            model=self.model,
+            max_tokens=4000,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            system=_ANTHROPIC_SYSTEM_BLOCKS[report]
+        ) as stream:
+            async for partial in _partial_reports(stream.text_stream, orjson.loads):
+                yield partial
+
+
+class AsyncGeminiProvider(GeminiPromptMixin, AsyncAIProvider):
+    """Async Google Gemini provider implementation"""
+
+    def _initialize_client(self):
+        from google import genai
+        return genai.Client(api_key=self.api_key)
+
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    async def analyze_code_quality(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_quality_prompt(code_content, language)
+        return await self._generate(prompt, 0.3)
+
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    async def generate_test_cases(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_test_prompt(code_content, language)
+        return await self._generate(prompt, 0.4)
+
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    async def get_code_suggestions(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_suggestions_prompt(code_content, language)
+        return await self._generate(prompt, 0.3)
+
+    @retry_transient
+    async def _generate(self, prompt: str, temperature: float) -> Dict[str, Any]:
+        from google.genai import types as genai_types
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=prompt,
+            config=genai_types.GenerateContentConfig(
+                response_mime_type="application/json",
+                temperature=temperature
+            )
+        )
+
+        return orjson.loads(response.text)
+
+    async def _stream(self, report: str, code_content: str, language: str) -> AsyncIterator[Dict[str, Any]]:
+        from google.genai import types as genai_types
+        prompt, temperature = self._stream_prompt(report, code_content, language)
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model,
+            contents=prompt,
+            config=genai_types.GenerateContentConfig(
+                response_mime_type="application/json",
+                temperature=temperature
+            )
+        )
+
+        async def deltas():
+            async for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+
+        async for partial in _partial_reports(deltas(), orjson.loads):
+            yield partial
+
+    async def aclose(self):
+        # The genai client holds no pooled connections that need closing
+        pass
+
+
+class AsyncPerplexityProvider(PromptMixin, AsyncAIProvider):
+    """Async Perplexity provider implementation"""
+
+    def _initialize_client(self):
+        return httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+            timeout=120
+        )
+
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    async def analyze_code_quality(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_quality_prompt(code_content, language)
+        return await self._make_request(prompt, SYS_REVIEWER_JSON)
+
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    async def generate_test_cases(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_test_prompt(code_content, language)
+        return await self._make_request(prompt, SYS_TESTER_JSON)
+
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    async def get_code_suggestions(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_suggestions_prompt(code_content, language)
+        return await self._make_request(prompt, SYS_ARCHITECT_JSON)
+
+    @retry_transient
+    async def _make_request(self, prompt: str, system_message: Dict[str, str]) -> Dict[str, Any]:
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+
+        data = {
+            'model': self.model,
+            'messages': [
+                system_message,
+                {'role': 'user', 'content': prompt}
+            ],
+            'temperature': 0.3,
+            'stream': False
+        }
+
+        response = await self.client.post(
+            'https://api.perplexity.ai/chat/completions',
+            headers=headers,
+            content=orjson.dumps(data),
+            timeout=REQUEST_TIMEOUT
+        )
+
+        if response.status_code == 200:
+            result = orjson.loads(response.content)
+            return orjson.loads(result['choices'][0]['message']['content'])
+        else:
+            raise ProviderAPIError(f"Perplexity API error: {response.status_code} - {response.text}", response.status_code)
+
+    async def _stream(self, report: str, code_content: str, language: str) -> AsyncIterator[Dict[str, Any]]:
+        prompt, _ = self._stream_prompt(report, code_content, language)
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+
+        data = {
+            'model': self.model,
+            'messages': [
+                _JSON_SYSTEM_MESSAGES[report],
+                {'role': 'user', 'content': prompt}
+            ],
+            'temperature': 0.3,
+            'stream': True
+        }
+
+        async with self.client.stream(
+            'POST',
+            'https://api.perplexity.ai/chat/completions',
+            headers=headers,
+            content=orjson.dumps(data)
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise ProviderAPIError(f"Perplexity API error: {response.status_code} - {response.text}", response.status_code)
+
+            async def deltas():
+                # Server-sent events: one "data: {...}" line per chunk, then "data: [DONE]"
+                async for line in response.aiter_lines():
+                    if not line.startswith('data:'):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == '[DONE]':
+                        break
+                    delta = orjson.loads(payload)['choices'][0].get('delta', {}).get('content')
+                    if delta:
+                        yield delta
+
+            async for partial in _partial_reports(deltas(), orjson.loads):
+                yield partial
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class AsyncHTTPProvider(PromptMixin, AsyncAIProvider):
+    """Async generic HTTP provider for OpenAI-compatible chat completion APIs"""
+
+    def __init__(self, api_key: str, model: str, base_url: str, headers: Dict[str, str] = None):
+        self.base_url = base_url
+        self.headers = headers or {}
+        super().__init__(api_key, model)
+
+    def _initialize_client(self):
+        return httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            timeout=60
+        )
+
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    async def analyze_code_quality(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_quality_prompt(code_content, language)
+        return await self._make_request(prompt, SYS_REVIEWER_JSON)
+
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    async def generate_test_cases(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_test_prompt(code_content, language)
+        return await self._make_request(prompt, SYS_TESTER_JSON)
+
+    @preflight
+    @map_reduce
+    @llm_cache()
+    @rate_limited
+    async def get_code_suggestions(self, code_content: str, language: str) -> Dict[str, Any]:
+        prompt = self._build_suggestions_prompt(code_content, language)
+        return await self._make_request(prompt, SYS_ARCHITECT_JSON)
+
+    @retry_transient
+    async def _make_request(self, prompt: str, system_message: Dict[str, str]) -> Dict[str, Any]:
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json',
+            **self.headers
+        }
+
+        data = {
+            'model': self.model,
+            'messages': [
+                system_message,
+                {'role': 'user', 'content': prompt}
+            ],
+            'temperature': 0.3,
+            'max_tokens': 4000
+        }
+
+        response = await self.client.post(f"{self.base_url}/chat/completions", headers=headers, content=orjson.dumps(data), timeout=REQUEST_TIMEOUT)
+
+        if response.status_code == 200:
+            result = orjson.loads(response.content)
+            content = result['choices'][0]['message']['content']
+            try:
+                return orjson.loads(content)
+            except orjson.JSONDecodeError:
+                # Fallback for non-JSON responses
+                return {"error": "Invalid JSON response", "content": content}
+        else:
+            raise ProviderAPIError(f"API error: {response.status_code} - {response.text}", response.status_code)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+# provider -> callable(api_key, model) building its async provider
+_PROVIDER_FACTORIES = MappingProxyType({
+    'openai': AsyncOpenAIProvider,
+    'anthropic': AsyncAnthropicProvider,
+    'gemini': AsyncGeminiProvider,
+    'perplexity': AsyncPerplexityProvider,
+    'xai': AsyncXAIProvider,
+    **{
+        provider_name: functools.partial(AsyncHTTPProvider, base_url=base_url)
+        for provider_name, base_url in HTTP_PROVIDER_BASE_URLS.items()
+    }
+})
+
+
+def create_async_ai_provider(provider_name: str, api_key: str, model: str) -> AsyncAIProvider:
+    """Factory function to create async AI provider instances"""
+
+    try:
+        factory = _PROVIDER_FACTORIES[provider_name]
+    except KeyError:
+        raise ValueError(f"Unsupported async AI provider: {provider_name}") from None
+    return factory(api_key, model)
+
+
+async def analyze_all(provider: AsyncAIProvider, code_content: str, language: str) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """Run quality analysis, test generation and suggestions concurrently"""
+    return await asyncio.gather(
+        provider.analyze_code_quality(code_content, language),
+        provider.generate_test_cases(code_content, language),
+        provider.get_code_suggestions(code_content, language)
+    )
+
+
+def analyze_all_sync(provider: AsyncAIProvider, code_content: str, language: str) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """Synchronous façade over analyze_all; closes the provider when done"""
+    async def _run():
+        async with provider:
+            return await analyze_all(provider, code_content, language)
+
+    return asyncio.run(_run())
+
+
+async def validate_api_key_async(provider: str, api_key: str, client: httpx.AsyncClient) -> bool:
+    """Async validate_api_key using the caller's client"""
+    probe = _key_probe(provider, api_key)
+    if probe is None:
+        return False
+    try:
+        response = await client.request(**probe, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return True
+    except httpx.HTTPError:
+        return False
+
+
+async def validate_all_api_keys(keys: Dict[str, str]) -> Dict[str, bool]:
+    """Validate several providers' keys concurrently over one client, keyed by provider"""
+    async with httpx.AsyncClient(http2=HTTP2_AVAILABLE) as client:
+        results = await asyncio.gather(*(
+            validate_api_key_async(provider, api_key, client) for provider, api_key in keys.items()
+        ))
+    return dict(zip(keys, results))
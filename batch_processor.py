@@ -0,0 +1,222 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+
+from ai_service import (
+    MAX_RETRIES, PromptMixin, AnthropicPromptMixin, preflight_response,
+    SYSTEM_REVIEWER, SYSTEM_TESTER, SYSTEM_ARCHITECT,
+    ANTHROPIC_SYSTEM_REVIEWER, ANTHROPIC_SYSTEM_TESTER, ANTHROPIC_SYSTEM_ARCHITECT
+)
+from async_ai_service import create_async_ai_provider
+
+# method name -> (prompt builder name, system message, Anthropic system blocks, temperature)
+_TASKS = {
+    'analyze_code_quality': (
+        '_build_quality_prompt',
+        SYSTEM_REVIEWER,
+        ANTHROPIC_SYSTEM_REVIEWER,
+        0.3
+    ),
+    'generate_test_cases': (
+        '_build_test_prompt',
+        SYSTEM_TESTER,
+        ANTHROPIC_SYSTEM_TESTER,
+        0.4
+    ),
+    'get_code_suggestions': (
+        '_build_suggestions_prompt',
+        SYSTEM_ARCHITECT,
+        ANTHROPIC_SYSTEM_ARCHITECT,
+        0.3
+    )
+}
+
+# Providers whose vendor offers an asynchronous, discounted batch endpoint
+BATCH_API_PROVIDERS = ('openai', 'anthropic')
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def _parse_content(content: str) -> Dict[str, Any]:
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        # One malformed completion should not sink the rest of the batch
+        return {"error": "Invalid JSON response", "content": content}
+
+
+class BatchProcessor:
+    """Run one analysis method over many (code, language) inputs.
+
+    OpenAI and Anthropic inputs go through the vendor Batch API (half price,
+    separate rate limits, results within the completion window). Other
+    providers, or callers that need results immediately, fan out concurrent
+    requests gated by a semaphore and a requests-per-minute pacer.
+    """
+
+    def __init__(self, provider_name: str, api_key: str, model: str, poll_interval: float = 30.0):
+        self.provider_name = provider_name
+        self.api_key = api_key
+        self.model = model
+        self.poll_interval = poll_interval
+
+    async def run_batch(self, method_name: str, codes: List[Tuple[str, str]],
+                        max_concurrency: int = 10, rate_limit_rpm: int = 100,
+                        progress: Optional[ProgressCallback] = None,
+                        use_batch_api: bool = True) -> List[Dict[str, Any]]:
+        """Run method_name over every (code_content, language) pair, preserving input order"""
+        if method_name not in _TASKS:
+            raise ValueError(f"Unsupported batch method: {method_name}")
+        # Empty, oversized or binary inputs are answered without a model call
+        results = [preflight_response(method_name, code_content) for code_content, _ in codes]
+        pending = [index for index, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        pending_codes = [codes[index] for index in pending]
+
+        if use_batch_api and self.provider_name in BATCH_API_PROVIDERS:
+            if self.provider_name == 'openai':
+                pending_results = await self._run_openai_batch(method_name, pending_codes, progress)
+            else:
+                pending_results = await self._run_anthropic_batch(method_name, pending_codes, progress)
+        else:
+            pending_results = await self._run_concurrent(method_name, pending_codes, max_concurrency, rate_limit_rpm, progress)
+
+        for index, result in zip(pending, pending_results):
+            results[index] = result
+        return results
+
+    async def _run_concurrent(self, method_name: str, codes: List[Tuple[str, str]],
+                              max_concurrency: int, rate_limit_rpm: int,
+                              progress: Optional[ProgressCallback]) -> List[Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(max_concurrency)
+        pace_lock = asyncio.Lock()
+        interval = 60.0 / rate_limit_rpm if rate_limit_rpm else 0.0
+        next_start = time.monotonic()
+        done = 0
+
+        async def run_one(provider, code_content: str, language: str) -> Dict[str, Any]:
+            nonlocal next_start, done
+            async with semaphore:
+                # Space request starts evenly so a burst never exceeds the RPM budget
+                async with pace_lock:
+                    delay = next_start - time.monotonic()
+                    next_start = max(next_start, time.monotonic()) + interval
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                try:
+                    return await getattr(provider, method_name)(code_content, language)
+                except Exception as e:
+                    return {"error": str(e)}
+                finally:
+                    done += 1
+                    if progress:
+                        progress(done, len(codes))
+
+        async with create_async_ai_provider(self.provider_name, self.api_key, self.model) as provider:
+            return await asyncio.gather(*(run_one(provider, code, lang) for code, lang in codes))
+
+    async def _run_openai_batch(self, method_name: str, codes: List[Tuple[str, str]],
+                                progress: Optional[ProgressCallback]) -> List[Dict[str, Any]]:
+        builder_name, system_message, _, temperature = _TASKS[method_name]
+        build_prompt = getattr(PromptMixin, builder_name)
+        lines = []
+        for index, (code_content, language) in enumerate(codes):
+            lines.append(orjson.dumps({
+                "custom_id": str(index),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model,
+                    "messages": [
+                        {"role": "system", "content": system_message},
+                        {"role": "user", "content": build_prompt(code_content, language)}
+                    ],
+                    "response_format": {"type": "json_object"},
+                    "temperature": temperature
+                }
+            }))
+
+        from openai import AsyncOpenAI
+        client = AsyncOpenAI(api_key=self.api_key, max_retries=MAX_RETRIES - 1)
+        try:
+            batch_file = await client.files.create(
+                file=("batch.jsonl", b"\n".join(lines)),
+                purpose="batch"
+            )
+            batch = await client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                if progress and batch.request_counts:
+                    progress(batch.request_counts.completed + batch.request_counts.failed, len(codes))
+                await asyncio.sleep(self.poll_interval)
+                batch = await client.batches.retrieve(batch.id)
+
+            results = [{"error": f"Batch {batch.id} ended with status {batch.status}"} for _ in codes]
+            if batch.output_file_id:
+                output = await client.files.content(batch.output_file_id)
+                for line in output.text.splitlines():
+                    if not line.strip():
+                        continue
+                    entry = orjson.loads(line)
+                    index = int(entry["custom_id"])
+                    response = entry.get("response") or {}
+                    if response.get("status_code") == 200:
+                        content = response["body"]["choices"][0]["message"]["content"]
+                        results[index] = _parse_content(content)
+                    else:
+                        results[index] = {"error": str(entry.get("error") or response)}
+        finally:
+            await client.close()
+
+        if progress:
+            progress(len(codes), len(codes))
+        return results
+
+    async def _run_anthropic_batch(self, method_name: str, codes: List[Tuple[str, str]],
+                                   progress: Optional[ProgressCallback]) -> List[Dict[str, Any]]:
+        builder_name, _, system_blocks, _ = _TASKS[method_name]
+        build_prompt = getattr(AnthropicPromptMixin, builder_name)
+        batch_requests = [
+            {
+                "custom_id": str(index),
+                "params": {
+                    "model": self.model,
+                    "max_tokens": 4000,
+                    "system": system_blocks,
+                    "messages": [{"role": "user", "content": build_prompt(code_content, language)}]
+                }
+            }
+            for index, (code_content, language) in enumerate(codes)
+        ]
+
+        import anthropic
+        client = anthropic.AsyncAnthropic(api_key=self.api_key, max_retries=MAX_RETRIES - 1)
+        try:
+            batch = await client.messages.batches.create(requests=batch_requests)
+            while batch.processing_status != "ended":
+                if progress:
+                    counts = batch.request_counts
+                    progress(counts.succeeded + counts.errored + counts.canceled + counts.expired, len(codes))
+                await asyncio.sleep(self.poll_interval)
+                batch = await client.messages.batches.retrieve(batch.id)
+
+            results = [{"error": f"No result returned for batch {batch.id}"} for _ in codes]
+            async for entry in await client.messages.batches.results(batch.id):
+                index = int(entry.custom_id)
+                if entry.result.type == "succeeded":
+                    results[index] = _parse_content(entry.result.message.content[0].text)
+                else:
+                    results[index] = {"error": f"Request {entry.result.type}"}
+        finally:
+            await client.close()
+
+        if progress:
+            progress(len(codes), len(codes))
+        return results
@@ -0,0 +1,178 @@
+"""Keep code payloads within a token budget before they are inlined into prompts.
+
+Every analysis sends the whole file three times (quality, tests, suggestions),
+so oversized files are shrunk once here. Python sources keep their structure:
+the bodies of the largest functions are replaced with ``...`` (signatures and
+docstrings stay) until the file fits. Other languages, or Python that still
+does not fit, keep their first and last lines with a marker in between saying
+how much was left out.
+"""
+import ast
+import functools
+import logging
+import os
+from types import MappingProxyType
+from typing import List, Optional, Tuple
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+CODE_TOKEN_BUDGET = int(os.environ.get('AI_CODE_TOKEN_BUDGET', 8000))
+
+# Vendor tokenizers differ, so one modern BPE serves as the estimate for all
+TOKENIZER_ENCODING = 'o200k_base'
+
+# Rough token cost of the instructions and system message around the code
+PROMPT_OVERHEAD_TOKENS = 600
+
+# Output the providers are allowed (max_tokens) and that the context must leave room for
+MAX_OUTPUT_TOKENS = 4000
+
+# Context windows of offered models too small for a full-budget prompt plus its
+# answer; every other model fits CODE_TOKEN_BUDGET comfortably
+MODEL_CONTEXT_TOKENS = MappingProxyType({
+    'gpt-4': 8192,
+    'gpt-4-0613': 8192,
+    'grok-1': 8192,
+    'command': 4096,
+    'command-nightly': 4096,
+    'command-light': 4096,
+    'command-light-nightly': 4096,
+    'meta-llama/Llama-2-70b-chat-hf': 4096,
+    'meta-llama/Llama-2-13b-chat-hf': 4096,
+    'meta-llama/Llama-2-7b-chat-hf': 4096,
+    'bigcode/starcoder': 8192,
+    'Salesforce/codegen-16B-mono': 2048,
+    'microsoft/DialoGPT-large': 1024,
+    'microsoft/CodeBERT-base': 512
+})
+
+# Never shrink the code below this, even for models that cannot fit the prompt anyway
+MIN_CODE_TOKEN_BUDGET = 256
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding():
+    try:
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        # The BPE ranks are downloaded on first use; fall back to estimating
+        logger.warning("Could not load tokenizer %s: %s", TOKENIZER_ENCODING, e)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken, or estimate at ~4 characters per token if its BPE ranks are unavailable"""
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def code_budget_for_model(model: str) -> int:
+    """Code token budget that leaves room for the prompt and the answer in the model's context"""
+    context = MODEL_CONTEXT_TOKENS.get(model)
+    if context is None:
+        return CODE_TOKEN_BUDGET
+    reserve = min(MAX_OUTPUT_TOKENS, context // 4)
+    return max(MIN_CODE_TOKEN_BUDGET, min(CODE_TOKEN_BUDGET, context - PROMPT_OVERHEAD_TOKENS - reserve))
+
+
+def _elide_python_bodies(lines: List[str], line_tokens: List[int], total: int, budget: int) -> Tuple[List[str], int]:
+    try:
+        tree = ast.parse(''.join(lines))
+    except (SyntaxError, ValueError):
+        return lines, total
+
+    # (first body line, last body line, indent) for every function, largest first
+    bodies = []
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        body = node.body
+        if ast.get_docstring(node) is not None:
+            body = body[1:]
+        if not body:
+            continue
+        first, last = body[0].lineno - 1, node.end_lineno - 1
+        # A body sharing the def line ("def f(): return 1") has nothing to save
+        if first <= node.lineno - 1:
+            continue
+        indent = lines[first][:len(lines[first]) - len(lines[first].lstrip())]
+        bodies.append((first, last, indent))
+    bodies.sort(key=lambda body: sum(line_tokens[body[0]:body[1] + 1]), reverse=True)
+
+    replaced = {}
+    elided = [False] * len(lines)
+    for first, last, indent in bodies:
+        if total <= budget:
+            break
+        if any(elided[first:last + 1]):
+            # Nested in (or enclosing) a body that is already gone
+            continue
+        stub = f"{indent}...\n"
+        total += count_tokens(stub) - sum(line_tokens[first:last + 1])
+        for index in range(first, last + 1):
+            elided[index] = True
+        replaced[first] = stub
+
+    result = []
+    for index, line in enumerate(lines):
+        if index in replaced:
+            result.append(replaced[index])
+        elif not elided[index]:
+            result.append(line)
+    return result, total
+
+
+# Comment syntax for the omission marker; languages without one get it bare
+_COMMENT_FORMATS = {
+    'python': '# {}', 'ruby': '# {}', 'bash': '# {}', 'yaml': '# {}',
+    'javascript': '// {}', 'typescript': '// {}', 'java': '// {}', 'cpp': '// {}',
+    'c': '// {}', 'csharp': '// {}', 'php': '// {}', 'go': '// {}', 'rust': '// {}',
+    'swift': '// {}', 'kotlin': '// {}', 'scala': '// {}',
+    'sql': '-- {}', 'css': '/* {} */', 'html': '<!-- {} -->', 'xml': '<!-- {} -->'
+}
+
+
+def _truncate_lines(lines: List[str], budget: int, language: str) -> str:
+    # Keep the head and the tail (imports and entry points) and drop the middle
+    head = []
+    used = 0
+    for line in lines:
+        cost = count_tokens(line)
+        if used + cost > budget // 2:
+            break
+        head.append(line)
+        used += cost
+    tail = []
+    for line in reversed(lines[len(head):]):
+        cost = count_tokens(line)
+        if used + cost > budget:
+            break
+        tail.append(line)
+        used += cost
+    tail.reverse()
+    omitted = len(lines) - len(head) - len(tail)
+    if not omitted:
+        return ''.join(lines)
+    marker = f"... {omitted} lines omitted to fit the analysis token budget"
+    return ''.join(head) + "\n" + _COMMENT_FORMATS.get(language, '{}').format(marker) + "\n\n" + ''.join(tail)
+
+
+@functools.lru_cache(maxsize=16)
+def fit_code_to_budget(code_content: str, language: str, budget: Optional[int] = None) -> str:
+    """Return code_content unchanged if it fits the token budget, otherwise a shrunk version"""
+    budget = budget or CODE_TOKEN_BUDGET
+    if count_tokens(code_content) <= budget:
+        return code_content
+
+    lines = code_content.splitlines(keepends=True)
+    line_tokens = [count_tokens(line) for line in lines]
+    total = sum(line_tokens)
+    if language == 'python':
+        lines, total = _elide_python_bodies(lines, line_tokens, total, budget)
+        if total <= budget:
+            return ''.join(lines)
+    return _truncate_lines(lines, budget, language)
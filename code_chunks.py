@@ -0,0 +1,176 @@
+"""Map-reduce analysis of files too large for a single prompt.
+
+Files over the model's code token budget used to be elided or truncated until
+they fit. Instead, ``split_code`` cuts them at top-level definitions into chunks
+of a few thousand tokens, each analysis method runs on every chunk in parallel,
+and ``merge_reports`` folds the per-chunk reports back into one: lists are
+concatenated (issue line numbers shifted back to file positions), scores are
+averaged weighted by chunk length.
+"""
+import ast
+import asyncio
+import functools
+import inspect
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from code_budget import code_budget_for_model, count_tokens, fit_code_to_budget
+
+# Target size of one chunk; larger files use fewer, bigger chunks (see below)
+CHUNK_TOKEN_BUDGET = int(os.environ.get('AI_CHUNK_TOKEN_BUDGET', 2000))
+
+# Upper bound on model calls per analysis method for one file
+MAX_CODE_CHUNKS = int(os.environ.get('AI_MAX_CODE_CHUNKS', 8))
+
+
+def _python_boundaries(lines: List[str]) -> List[int]:
+    try:
+        tree = ast.parse(''.join(lines))
+    except (SyntaxError, ValueError):
+        return []
+    boundaries = []
+    for node in tree.body:
+        # Decorators belong to the definition below them
+        decorators = getattr(node, 'decorator_list', [])
+        boundaries.append(min([node.lineno] + [d.lineno for d in decorators]) - 1)
+    return boundaries
+
+
+def _top_level_boundaries(lines: List[str]) -> List[int]:
+    # Unindented lines after a blank line start a new top-level block in most languages
+    return [
+        index for index in range(1, len(lines))
+        if lines[index].strip() and not lines[index][0].isspace() and not lines[index - 1].strip()
+    ]
+
+
+def split_code(code_content: str, language: str, max_tokens: int) -> List[Tuple[int, str]]:
+    """Split code at top-level definitions into (first line offset, text) chunks of at most max_tokens.
+
+    A Python definition larger than max_tokens becomes a chunk of its own (it
+    is elided to fit later); in other languages, where the boundaries are only
+    a guess, oversized blocks are cut between lines.
+    """
+    lines = code_content.splitlines(keepends=True)
+    boundaries = _python_boundaries(lines) if language == 'python' else []
+    keep_units_whole = bool(boundaries)
+    if not boundaries:
+        boundaries = _top_level_boundaries(lines)
+    starts = sorted({0, *(b for b in boundaries if 0 < b < len(lines))})
+    units = []
+    for start, end in zip(starts, starts[1:] + [len(lines)]):
+        block = ''.join(lines[start:end])
+        if keep_units_whole or count_tokens(block) <= max_tokens:
+            units.append((start, block))
+        else:
+            units.extend(enumerate(lines[start:end], start))
+
+    chunks = []
+    chunk_start, parts, used = 0, [], 0
+    for start, text in units:
+        cost = count_tokens(text)
+        if parts and used + cost > max_tokens:
+            chunks.append((chunk_start, ''.join(parts)))
+            chunk_start, parts, used = start, [], 0
+        parts.append(text)
+        used += cost
+    if parts:
+        chunks.append((chunk_start, ''.join(parts)))
+    return chunks
+
+
+def plan_chunks(code_content: str, language: str, budget: int) -> List[Tuple[int, str]]:
+    """Chunks to analyze separately, each fitted to budget; a single chunk when the file fits one prompt"""
+    total = count_tokens(code_content)
+    if total <= budget:
+        return [(0, code_content)]
+    max_tokens = min(budget, max(CHUNK_TOKEN_BUDGET, math.ceil(total / MAX_CODE_CHUNKS)))
+    chunks = split_code(code_content, language, max_tokens)
+    # Packing whole definitions leaves chunks part-full, so grow them until the cap holds
+    while len(chunks) > MAX_CODE_CHUNKS:
+        max_tokens += max_tokens // 4
+        chunks = split_code(code_content, language, max_tokens)
+    # Chunks over the budget (a huge definition, or the chunk cap) are shrunk
+    # here, so the count the rate limiter and the model see is the real one
+    return [(offset, fit_code_to_budget(text, language, budget)) for offset, text in chunks]
+
+
+def _merge_values(key: str, values: List[Tuple[Any, int, int]]) -> Any:
+    """Merge one field across chunks from (value, weight, line offset) triples"""
+    first = values[0][0]
+    if isinstance(first, bool):
+        return first
+    if isinstance(first, (int, float)):
+        numbers = [(value, weight) for value, weight, _ in values if isinstance(value, (int, float))]
+        total_weight = sum(weight for _, weight in numbers) or 1
+        return round(sum(value * weight for value, weight in numbers) / total_weight, 1)
+    if isinstance(first, dict):
+        return _merge_dicts([(value, weight, offset) for value, weight, offset in values if isinstance(value, dict)])
+    if isinstance(first, list):
+        merged = []
+        seen = set()
+        for value, _, offset in values:
+            for item in value if isinstance(value, list) else []:
+                if isinstance(item, dict) and isinstance(item.get('line'), int):
+                    item = {**item, 'line': item['line'] + offset}
+                if isinstance(item, str):
+                    if item in seen:
+                        continue
+                    seen.add(item)
+                merged.append(item)
+        return merged
+    if isinstance(first, str):
+        if key == 'summary':
+            return ' '.join(dict.fromkeys(value for value, _, _ in values if value))
+        # Categorical fields (complexity, test_framework): the choice covering the most code
+        weights = {}
+        for value, weight, _ in values:
+            weights[value] = weights.get(value, 0) + weight
+        return max(weights, key=weights.get)
+    return first
+
+
+def _merge_dicts(values: List[Tuple[Dict[str, Any], int, int]]) -> Dict[str, Any]:
+    keys = dict.fromkeys(key for value, _, _ in values for key in value)
+    return {
+        key: _merge_values(key, [(value[key], weight, offset) for value, weight, offset in values if key in value])
+        for key in keys
+    }
+
+
+def merge_reports(reports: List[Dict[str, Any]], chunks: List[Tuple[int, str]]) -> Dict[str, Any]:
+    """Fold per-chunk reports into one report for the whole file"""
+    values = [
+        (report, chunk_text.count('\n') + 1, offset)
+        for report, (offset, chunk_text) in zip(reports, chunks)
+        if isinstance(report, dict) and 'error' not in report
+    ]
+    if not values:
+        return reports[0]
+    return _merge_dicts(values)
+
+
+def map_reduce(method):
+    """Fit code to the model's budget, running the method per chunk in parallel and merging the reports if needed"""
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, code_content: str, language: str):
+            chunks = plan_chunks(code_content, language, code_budget_for_model(self.model))
+            if len(chunks) == 1:
+                return await method(self, chunks[0][1], language)
+            reports = await asyncio.gather(*(method(self, text, language) for _, text in chunks))
+            return merge_reports(list(reports), chunks)
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, code_content: str, language: str):
+        chunks = plan_chunks(code_content, language, code_budget_for_model(self.model))
+        if len(chunks) == 1:
+            return method(self, chunks[0][1], language)
+        # Each chunk call still takes a slot from the provider's rate limiter
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            reports = list(executor.map(lambda chunk: method(self, chunk[1], language), chunks))
+        return merge_reports(reports, chunks)
+    return wrapper
@@ -0,0 +1,13 @@
+import os
+
+# Analyses spend most of their time waiting on LLM APIs, so each worker serves
+# many requests on threads instead of one at a time (the sync worker default).
+# The app is not preloaded, so each worker opens its own connection pools after the fork.
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 32))
+
+# A long analysis must not get its worker killed mid-request
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 300))
+graceful_timeout = 30
+keepalive = 5
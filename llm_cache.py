@@ -0,0 +1,287 @@
+import asyncio
+import copy
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Protocol, Tuple
+
+import orjson
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(Protocol):
+    """Storage interface for cached LLM responses"""
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    def set(self, key: str, value: Dict[str, Any], ttl: int) -> None:
+        ...
+
+    def clear(self) -> None:
+        ...
+
+
+class MemoryBackend:
+    """In-process LRU cache with per-entry expiry; entries are stored serialized so every hit is a fresh copy"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return orjson.loads(value)
+
+    def set(self, key: str, value: Dict[str, Any], ttl: int) -> None:
+        data = orjson.dumps(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class FileBackend:
+    """Cache stored as one JSON file per key, shared between worker processes"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                entry = orjson.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if entry['expires_at'] < time.time():
+            return None
+        return entry['value']
+
+    def set(self, key: str, value: Dict[str, Any], ttl: int) -> None:
+        # Write to a temp file first so readers never see a half-written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(orjson.dumps({'expires_at': time.time() + ttl, 'value': value}))
+        os.replace(tmp_path, self._path(key))
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.directory, name))
+
+
+class RedisBackend:
+    """Cache stored in Redis, shared between worker processes and hosts"""
+
+    def __init__(self, url: str, prefix: str = 'llm_cache:'):
+        if redis is None:
+            raise ImportError("The 'redis' package is required for the Redis cache backend")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self._client.get(self.prefix + key)
+        return orjson.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Dict[str, Any], ttl: int) -> None:
+        self._client.set(self.prefix + key, orjson.dumps(value), ex=ttl)
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter(self.prefix + '*'):
+            self._client.delete(key)
+
+
+def _backend_from_env() -> Optional[CacheBackend]:
+    """Build the cache backend selected by the LLM_CACHE_BACKEND environment variable"""
+    backend = os.environ.get('LLM_CACHE_BACKEND', 'memory').lower()
+    if backend == 'memory':
+        return MemoryBackend(int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 1024)))
+    elif backend == 'file':
+        return FileBackend(os.environ.get('LLM_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'codespark_llm_cache')))
+    elif backend == 'redis':
+        return RedisBackend(os.environ.get('LLM_CACHE_URL', 'redis://localhost:6379/0'))
+    elif backend == 'none':
+        return None
+    else:
+        raise ValueError(f"Unsupported LLM cache backend: {backend}")
+
+
+_backend = _backend_from_env()
+
+
+def get_backend() -> Optional[CacheBackend]:
+    """Return the active cache backend (None when caching is disabled)"""
+    return _backend
+
+
+def set_backend(backend: Optional[CacheBackend]) -> None:
+    """Replace the active cache backend; pass None to disable caching"""
+    global _backend
+    _backend = backend
+
+
+def make_key(provider: str, model: str, method: str, code_content: str, language: str,
+             prompt_fingerprint: str = '') -> str:
+    """Build the exact-match cache key for a provider call.
+
+    prompt_fingerprint identifies the prompts and response format, so persisted
+    entries stop matching once either changes.
+    """
+    payload = orjson.dumps({
+        'provider': provider,
+        'model': model,
+        'method': method,
+        'prompt': prompt_fingerprint,
+        'language': language,
+        'code': code_content
+    }, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _provider_id(provider) -> str:
+    # Sync and async variants share entries; HTTPProvider serves several vendors,
+    # so the endpoint is part of its identity
+    name = type(provider).__name__.removeprefix('Async')
+    base_url = getattr(provider, 'base_url', '')
+    return f"{name}:{base_url}"
+
+
+def _cache_get(backend: CacheBackend, key: str) -> Optional[Dict[str, Any]]:
+    try:
+        return backend.get(key)
+    except Exception as e:
+        # A broken cache must never fail the analysis itself
+        logger.warning("LLM cache read failed: %s", e)
+        return None
+
+
+def _cache_set(backend: CacheBackend, key: str, result, ttl: int) -> None:
+    if not isinstance(result, dict) or 'error' in result:
+        return
+    try:
+        backend.set(key, result, ttl)
+    except Exception as e:
+        logger.warning("LLM cache write failed: %s", e)
+
+
+# Calls currently running, by cache key. Identical calls made meanwhile wait for
+# the first one instead of spending tokens on the same answer, and get their own
+# copy of its result. Thread futures work for both paths: async callers wrap
+# them, whatever event loop they run on.
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _join_inflight(key: str) -> Tuple[Future, bool]:
+    """Return the running call's future, or register a new one; the flag is True for the caller that must run it"""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future, False
+        future = _inflight[key] = Future()
+        return future, True
+
+
+def _settle_inflight(key: str, future: Future, result=None, error: Optional[BaseException] = None) -> None:
+    with _inflight_lock:
+        _inflight.pop(key, None)
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def _call_once(backend: Optional[CacheBackend], key: str, ttl: int, call):
+    """Serve a call from the cache, from an identical call in flight, or by running it"""
+    if backend is not None:
+        cached = _cache_get(backend, key)
+        if cached is not None:
+            return cached
+    future, leader = _join_inflight(key)
+    if not leader:
+        return copy.deepcopy(future.result())
+    try:
+        result = call()
+    except BaseException as e:
+        _settle_inflight(key, future, error=e)
+        raise
+    if backend is not None:
+        _cache_set(backend, key, result, ttl)
+    _settle_inflight(key, future, result)
+    return result
+
+
+async def _call_once_async(backend: Optional[CacheBackend], key: str, ttl: int, call):
+    if backend is not None:
+        cached = _cache_get(backend, key)
+        if cached is not None:
+            return cached
+    future, leader = _join_inflight(key)
+    if not leader:
+        return copy.deepcopy(await asyncio.wrap_future(future))
+    try:
+        result = await call()
+    except BaseException as e:
+        _settle_inflight(key, future, error=e)
+        raise
+    if backend is not None:
+        _cache_set(backend, key, result, ttl)
+    _settle_inflight(key, future, result)
+    return result
+
+
+def llm_cache(ttl: int = 3600):
+    """Cache a provider method's parsed response keyed on provider, model, method, prompts, code and language.
+
+    Identical calls that arrive while one is running share its result. Works
+    for both regular and ``async def`` provider methods.
+    """
+    def decorator(method):
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(self, code_content: str, language: str):
+                key = make_key(_provider_id(self), self.model, method.__name__, code_content, language,
+                               getattr(self, 'prompt_fingerprint', ''))
+                return await _call_once_async(
+                    _backend, key, ttl, lambda: method(self, code_content, language)
+                )
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self, code_content: str, language: str):
+            key = make_key(_provider_id(self), self.model, method.__name__, code_content, language,
+                           getattr(self, 'prompt_fingerprint', ''))
+            return _call_once(_backend, key, ttl, lambda: method(self, code_content, language))
+        return wrapper
+    return decorator
@@ -1,26 +1,41 @@
 from app import db
 from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
+
+# Parsed AI results: JSONB on PostgreSQL, JSON text elsewhere. None is stored as SQL NULL.
+JSONDocument = db.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql')
 
 class CodeAnalysis(db.Model):
+    __table_args__ = (
+        db.Index('ix_analysis_result_gin', 'analysis_result', postgresql_using='gin').ddl_if(dialect='postgresql'),
+        # Newest-first listings filtered by language
+        db.Index('ix_codeanalysis_lang_created', 'language', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    filename = db.Column(db.String(255), nullable=False)
+    filename = db.Column(db.String(255), nullable=False, index=True)
     original_filename = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
-    language = db.Column(db.String(50))
+    language = db.Column(db.String(50), index=True)
     file_size = db.Column(db.Integer)
-    analysis_result = db.Column(db.Text)
-    test_suggestions = db.Column(db.Text)
+    analysis_result = db.Column(JSONDocument)
+    test_suggestions = db.Column(JSONDocument)
     quality_score = db.Column(db.Float)
     issues_count = db.Column(db.Integer, default=0)
     suggestions_count = db.Column(db.Integer, default=0)
     ai_model = db.Column(db.String(100))  # Track which AI model was used
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    metrics = db.relationship('AnalysisMetrics', back_populates='analysis', lazy=True)
+
     def __repr__(self):
         return f'<CodeAnalysis {self.filename}>'
 
 class AnalysisMetrics(db.Model):
+    # Also serves lookups by analysis_id alone
+    __table_args__ = (db.Index('ix_metrics_analysis_type', 'analysis_id', 'metric_type'),)
+
     id = db.Column(db.Integer, primary_key=True)
     analysis_id = db.Column(db.Integer, db.ForeignKey('code_analysis.id'), nullable=False)
     metric_name = db.Column(db.String(100), nullable=False)
@@ -28,11 +43,32 @@ class AnalysisMetrics(db.Model):
     metric_type = db.Column(db.String(50))  # 'quality', 'complexity', 'security', etc.
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    analysis = db.relationship('CodeAnalysis', backref=db.backref('metrics', lazy=True))
+    analysis = db.relationship('CodeAnalysis', back_populates='metrics')
 
     def __repr__(self):
         return f'<AnalysisMetrics {self.metric_name}>'
 
+class AnalysisCache(db.Model):
+    """AI results by code content, reused when the same code is analyzed again with the same model"""
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'language', 'provider', 'model', 'prompt_version',
+                            name='uq_analysis_cache_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)  # sha256 of the code
+    language = db.Column(db.String(50), nullable=False)
+    provider = db.Column(db.String(50), nullable=False)
+    model = db.Column(db.String(100), nullable=False)
+    prompt_version = db.Column(db.String(16), nullable=False)
+    quality_analysis = db.Column(JSONDocument)
+    test_suggestions = db.Column(JSONDocument)
+    code_suggestions = db.Column(JSONDocument)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AnalysisCache {self.content_hash[:12]} {self.provider}:{self.model}>'
+
 class UserSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String(255), nullable=False, unique=True)
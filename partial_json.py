@@ -0,0 +1,95 @@
+"""Best-effort parsing of a JSON document that is still being streamed.
+
+``parse_partial_json`` closes whatever strings, objects and arrays are open at
+the end of the buffer. If that is not yet valid JSON (a dangling key, ``tru``,
+a trailing ``:``), or the buffer ends in a number that may still grow, it
+falls back to the last point where a value was complete. The result is the
+largest prefix of the final document available so far.
+"""
+from typing import Any, List, Optional, Tuple
+
+import orjson
+
+
+def _closers(stack: List[str]) -> str:
+    return ''.join(reversed(stack))
+
+
+def parse_partial_json(text: str) -> Optional[Any]:
+    """Parse a possibly truncated JSON document; returns None if nothing usable has arrived yet"""
+    stack: List[str] = []
+    # (prefix length, closers needed) pairs where truncating leaves valid JSON
+    cut_points: List[Tuple[int, str]] = []
+    in_string = False
+    escape = False
+
+    for index, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+            cut_points.append((index + 1, _closers(stack)))
+        elif char in '}]':
+            if stack:
+                stack.pop()
+        elif char == ',':
+            cut_points.append((index, _closers(stack)))
+
+    candidates = []
+    if in_string:
+        # Drop a dangling escape so the closing quote is not swallowed by it
+        candidates.append((text[:-1] if escape else text) + '"' + _closers(stack))
+    elif not text.rstrip()[-1:].isdigit():
+        # A trailing number may still be growing ("8" before "85"), so only
+        # accept it once something follows
+        candidates.append(text + _closers(stack))
+    candidates.extend(text[:end] + closers for end, closers in reversed(cut_points))
+
+    for candidate in candidates:
+        try:
+            return orjson.loads(candidate)
+        except orjson.JSONDecodeError:
+            continue
+    return None
+
+
+class JSONDocumentEnd:
+    """Follows a streamed JSON object or array and finds where its top-level value closes"""
+
+    __slots__ = ('complete', '_depth', '_in_string', '_escape')
+
+    def __init__(self):
+        self.complete = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> int:
+        """Consume the next piece; returns the offset just past the closing bracket, or -1 while still open"""
+        for index, char in enumerate(text):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]' and self._depth:
+                self._depth -= 1
+                if not self._depth:
+                    self.complete = True
+                    return index + 1
+        return -1
@@ -0,0 +1,47 @@
+"""Count the SQL statements each request runs, to catch N+1 regressions early.
+
+Enabled in debug mode or with SQL_QUERY_COUNT=1. Every response carries an
+X-Query-Count header, and endpoints that exceed their budget log a warning
+(or fail the request with SQL_QUERY_COUNT_RAISE=1, for test runs).
+"""
+import logging
+import os
+from typing import Mapping
+
+from flask import Flask, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """An endpoint ran more SQL statements than its budget allows"""
+
+
+def query_counter_enabled(app: Flask) -> bool:
+    return app.debug or os.environ.get('SQL_QUERY_COUNT', '').lower() in ('1', 'true', 'yes')
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    # Statements run outside a request (startup, worker threads) are not counted
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def init_query_counter(app: Flask, budgets: Mapping[str, int]) -> None:
+    """Count statements per request and check them against per-endpoint budgets"""
+    raise_on_excess = os.environ.get('SQL_QUERY_COUNT_RAISE', '').lower() in ('1', 'true', 'yes')
+    event.listen(Engine, 'before_cursor_execute', _count_statement)
+
+    @app.after_request
+    def check_query_count(response):
+        count = g.get('query_count', 0)
+        response.headers['X-Query-Count'] = str(count)
+        budget = budgets.get(request.endpoint)
+        if budget is not None and count > budget:
+            message = f"{request.endpoint} ran {count} SQL statements (budget {budget})"
+            if raise_on_excess:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,227 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Tuple
+
+from code_budget import PROMPT_OVERHEAD_TOKENS, count_tokens, fit_code_to_budget
+
+# Sliding window for the per-minute limits
+WINDOW_SECONDS = 60.0
+
+MAX_CONCURRENT_REQUESTS = int(os.environ.get('AI_MAX_CONCURRENT_REQUESTS', 8))
+RATE_LIMIT_RPM = int(os.environ.get('AI_RATE_LIMIT_RPM', 0))
+RATE_LIMIT_TPM = int(os.environ.get('AI_RATE_LIMIT_TPM', 0))
+
+
+class RateLimiter:
+    """Caps concurrent calls plus requests and input tokens per minute for one API key.
+
+    Threads call acquire()/release() and coroutines acquire_async()/release().
+    The state is guarded by thread primitives rather than asyncio ones, so one
+    limiter can be shared by worker threads and by the short-lived event loops
+    the sync wrappers start. Coroutines waiting for a slot park on a future of
+    their own loop, which release() resolves thread-safely.
+    """
+
+    def __init__(self, max_concurrent: int = 8, rpm: int = 0, tpm: int = 0):
+        self.max_concurrent = max_concurrent
+        self.rpm = rpm
+        self.tpm = tpm
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._requests = deque()  # start times of requests inside the window
+        self._tokens = deque()  # (start time, tokens) inside the window
+        self._window_tokens = 0
+        self._waiting = 0  # callers queued for a slot or the per-minute budget
+        self._in_flight = 0
+        self._async_waiters = deque()  # (loop, future) of coroutines parked until a slot frees up
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - WINDOW_SECONDS
+        while self._requests and self._requests[0] <= cutoff:
+            self._requests.popleft()
+        while self._tokens and self._tokens[0][0] <= cutoff:
+            self._window_tokens -= self._tokens.popleft()[1]
+
+    def _admit(self, tokens: int) -> float:
+        """Record a request start and return 0, or return how long to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if self.rpm and len(self._requests) >= self.rpm:
+                return self._requests[0] + WINDOW_SECONDS - now
+            # A single request larger than the whole budget is let through on an empty window
+            if self.tpm and self._tokens and self._window_tokens + tokens > self.tpm:
+                return self._tokens[0][0] + WINDOW_SECONDS - now
+            self._requests.append(now)
+            if tokens:
+                self._tokens.append((now, tokens))
+                self._window_tokens += tokens
+            self._waiting -= 1
+            self._in_flight += 1
+            return 0.0
+
+    def _enqueue(self) -> None:
+        with self._lock:
+            self._waiting += 1
+
+    def _abandon(self, holds_slot: bool) -> None:
+        with self._lock:
+            self._waiting -= 1
+        if holds_slot:
+            self._slots.release()
+
+    def acquire(self, tokens: int = 0) -> None:
+        self._enqueue()
+        holds_slot = False
+        try:
+            self._slots.acquire()
+            holds_slot = True
+            while (delay := self._admit(tokens)) > 0:
+                time.sleep(delay)
+        except BaseException:
+            self._abandon(holds_slot)
+            raise
+
+    def _wake_async_waiter(self) -> None:
+        """Let the longest-parked coroutine retry for a slot"""
+        while True:
+            with self._lock:
+                if not self._async_waiters:
+                    return
+                loop, future = self._async_waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+                return
+            except RuntimeError:
+                continue  # its event loop has closed
+
+    async def _acquire_slot_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        while not self._slots.acquire(blocking=False):
+            waiter = (loop, loop.create_future())
+            with self._lock:
+                self._async_waiters.append(waiter)
+            woken = False
+            try:
+                # A slot freed between the first try and parking would wake nobody
+                if self._slots.acquire(blocking=False):
+                    return
+                await waiter[1]
+                woken = True
+            finally:
+                if not woken:
+                    with self._lock:
+                        try:
+                            self._async_waiters.remove(waiter)
+                            picked = False
+                        except ValueError:
+                            picked = True
+                    if picked:
+                        # release() chose this waiter, which no longer needs the slot: pass the wake-up on
+                        self._wake_async_waiter()
+
+    async def acquire_async(self, tokens: int = 0) -> None:
+        self._enqueue()
+        holds_slot = False
+        try:
+            await self._acquire_slot_async()
+            holds_slot = True
+            while (delay := self._admit(tokens)) > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._abandon(holds_slot)
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+        self._wake_async_waiter()
+
+    def stats(self) -> Dict[str, int]:
+        """Current load: calls running and queued, and usage of the per-minute limits (0 = unlimited)"""
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                'in_flight': self._in_flight,
+                'waiting': self._waiting,
+                'max_concurrent': self.max_concurrent,
+                'requests_last_minute': len(self._requests),
+                'rpm': self.rpm,
+                'tokens_last_minute': self._window_tokens,
+                'tpm': self.tpm
+            }
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+_limiters: Dict[Tuple[str, str, str], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _fingerprint(api_key: str) -> str:
+    return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()
+
+
+def get_limiter(provider) -> RateLimiter:
+    """Return the shared limiter for a provider's vendor endpoint and API key"""
+    # Sync and async variants of a provider count against the same limits
+    name = type(provider).__name__.removeprefix('Async')
+    key = (name, getattr(provider, 'base_url', ''), _fingerprint(provider.api_key))
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.setdefault(
+                key, RateLimiter(MAX_CONCURRENT_REQUESTS, RATE_LIMIT_RPM, RATE_LIMIT_TPM)
+            )
+    return limiter
+
+
+def limiter_stats(api_keys: Iterable[str]) -> List[Dict[str, Any]]:
+    """Load of the limiters in this process for the given API keys, identified by provider, endpoint and a short key fingerprint"""
+    fingerprints = {_fingerprint(api_key) for api_key in api_keys if api_key}
+    with _limiters_lock:
+        limiters = [(key, limiter) for key, limiter in _limiters.items() if key[2] in fingerprints]
+    return [
+        {'provider': name, 'base_url': base_url, 'key': fingerprint[:8], **limiter.stats()}
+        for (name, base_url, fingerprint), limiter in limiters
+    ]
+
+
+def _estimate_tokens(code_content: str, language: str) -> int:
+    if not RATE_LIMIT_TPM:
+        return 0
+    return count_tokens(fit_code_to_budget(code_content, language)) + PROMPT_OVERHEAD_TOKENS
+
+
+def rate_limited(method):
+    """Hold a concurrency slot and per-minute budget from the provider's limiter for the whole call"""
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, code_content: str, language: str):
+            limiter = get_limiter(self)
+            await limiter.acquire_async(_estimate_tokens(code_content, language))
+            try:
+                return await method(self, code_content, language)
+            finally:
+                limiter.release()
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, code_content: str, language: str):
+        limiter = get_limiter(self)
+        limiter.acquire(_estimate_tokens(code_content, language))
+        try:
+            return method(self, code_content, language)
+        finally:
+            limiter.release()
+    return wrapper
@@ -0,0 +1,107 @@
+"""Typed report structures for LLM structured outputs.
+
+The JSON Schemas sent with ``response_format`` are generated once at import
+from these structs, and responses are decoded straight into them with msgspec's
+compiled decoder, which also validates the shape.
+"""
+import hashlib
+from typing import Annotated, Any, Dict, List, Literal, Optional
+
+import msgspec
+
+
+def _doc(description: str) -> msgspec.Meta:
+    return msgspec.Meta(description=description)
+
+
+class Issue(msgspec.Struct, forbid_unknown_fields=True):
+    type: Literal["error", "warning", "suggestion"]
+    severity: Literal["high", "medium", "low"]
+    line: Annotated[Optional[int], _doc("line number of the issue, or null")]
+    message: Annotated[str, _doc("description of the issue")]
+    suggestion: Annotated[str, _doc("how to fix it")]
+
+
+class QualityMetrics(msgspec.Struct, forbid_unknown_fields=True):
+    complexity: Literal["low", "medium", "high"]
+    maintainability: Annotated[int | float, _doc("number between 0-100")]
+    readability: Annotated[int | float, _doc("number between 0-100")]
+    security: Annotated[int | float, _doc("number between 0-100")]
+
+
+class QualityReport(msgspec.Struct, forbid_unknown_fields=True):
+    quality_score: Annotated[int | float, _doc("number between 0-100")]
+    issues: List[Issue]
+    metrics: QualityMetrics
+    summary: Annotated[str, _doc("Overall summary of code quality")]
+    recommendations: Annotated[List[str], _doc("general recommendations for improvement")]
+
+
+class TestCase(msgspec.Struct, forbid_unknown_fields=True):
+    name: Annotated[str, _doc("test case name")]
+    description: Annotated[str, _doc("what this test validates")]
+    type: Literal["unit", "integration", "edge_case"]
+    priority: Literal["high", "medium", "low"]
+    test_code: Annotated[str, _doc("actual test code implementation")]
+
+
+class TestReport(msgspec.Struct, forbid_unknown_fields=True):
+    test_framework: Annotated[str, _doc("recommended testing framework for the language")]
+    test_cases: List[TestCase]
+    coverage_suggestions: Annotated[List[str], _doc("areas that need more test coverage")]
+    mocking_suggestions: Annotated[List[str], _doc("components that should be mocked and why")]
+
+
+class RefactoringSuggestion(msgspec.Struct, forbid_unknown_fields=True):
+    category: Literal["performance", "security", "maintainability", "style"]
+    description: Annotated[str, _doc("what to improve")]
+    before_code: Annotated[str, _doc("current problematic code snippet")]
+    after_code: Annotated[str, _doc("improved code snippet")]
+    explanation: Annotated[str, _doc("why this improvement matters")]
+
+
+class SuggestionReport(msgspec.Struct, forbid_unknown_fields=True):
+    refactoring_suggestions: List[RefactoringSuggestion]
+    architecture_suggestions: Annotated[List[str], _doc("high-level architectural improvements")]
+    dependency_suggestions: Annotated[List[str], _doc("library or framework recommendations")]
+
+
+REPORT_TYPES = {
+    'quality': QualityReport,
+    'tests': TestReport,
+    'suggestions': SuggestionReport
+}
+
+
+def _build_response_format(name: str, report_type: type) -> Dict[str, Any]:
+    (_,), components = msgspec.json.schema_components([report_type])
+    # Structured outputs need an object at the root, so inline the top-level
+    # struct and keep the nested ones as $defs
+    schema = dict(components.pop(report_type.__name__))
+    if components:
+        schema['$defs'] = components
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "schema": schema, "strict": True}
+    }
+
+
+RESPONSE_FORMATS = {
+    name: _build_response_format(name, report_type)
+    for name, report_type in REPORT_TYPES.items()
+}
+
+# Fingerprint of the schemas above; cached structured-output results are only reused under the same schemas
+SCHEMA_VERSION = hashlib.sha256(
+    msgspec.json.encode(RESPONSE_FORMATS, order='sorted')
+).hexdigest()[:16]
+
+_DECODERS = {
+    name: msgspec.json.Decoder(report_type)
+    for name, report_type in REPORT_TYPES.items()
+}
+
+
+def decode_report(content, report: str) -> Dict[str, Any]:
+    """Decode and validate a structured-output response into plain dicts"""
+    return msgspec.to_builtins(_DECODERS[report].decode(content))
@@ -1,22 +1,103 @@
+import asyncio
+import codecs
+import hashlib
+import math
 import os
-import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from datetime import datetime
-from flask import render_template, request, redirect, url_for, flash, jsonify, session
+import click
+from flask import abort, render_template, request, redirect, url_for, flash, jsonify, send_file, session
 from werkzeug.utils import secure_filename
-from cryptography.fernet import Fernet
+import orjson
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from sqlalchemy import Text, case, cast, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import defer, raiseload, selectinload
 import secrets
 from app import app, db
-from models import CodeAnalysis, AnalysisMetrics, UserSettings
-from ai_service import create_ai_provider, get_available_providers, validate_api_key, detect_language
+from models import CodeAnalysis, AnalysisMetrics, AnalysisCache, UserSettings
+from ai_service import ANALYSIS_METHODS, LANGUAGE_DETECTION_LIMIT, PROMPT_VERSION, PROVIDERS, create_ai_provider, get_available_providers, validate_api_key, detect_language
+from async_ai_service import validate_all_api_keys
+from batch_processor import BatchProcessor
+from rate_limiter import limiter_stats
+from query_counter import init_query_counter, query_counter_enabled
 
-ALLOWED_EXTENSIONS = {
+logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = frozenset({
     'py', 'js', 'ts', 'java', 'cpp', 'c', 'cs', 'php', 'rb', 'go', 'rs', 
     'swift', 'kt', 'scala', 'sh', 'sql', 'html', 'css', 'json', 'xml', 
     'yaml', 'yml', 'txt', 'md'
-}
+})
+
+# Uploads are decoded and written to disk in chunks this large; only the first
+# LANGUAGE_DETECTION_LIMIT bytes, all language detection looks at, stay in memory
+UPLOAD_BUFFER_SIZE = 1024 * 1024
+
+# Decoded code of recent uploads by file path, so the analysis right after an
+# upload skips reading the file back. Only uploads that fit in the language
+# detection read are cached, as they are in memory already.
+CODE_CACHE_SIZE = 64
+_code_cache = OrderedDict()
+_code_cache_lock = threading.Lock()
+
+# Settings form fields holding API keys, one per distinct provider key
+API_KEY_FIELDS = tuple(dict.fromkeys(spec.api_key_env for spec in PROVIDERS.values()))
+
+# Backfills of at least this many files use the discounted vendor batch APIs
+BATCH_QUEUE_THRESHOLD = int(os.environ.get('BATCH_QUEUE_THRESHOLD', 20))
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    _, dot, ext = filename.rpartition('.')
+    return bool(dot) and ext.lower() in ALLOWED_EXTENSIONS
+
+def save_upload(file, file_path):
+    """Stream an upload to disk unchanged, decoding it for analysis in the same pass.
+
+    Returns the size in bytes, the decoded start of the file (the whole file
+    when complete is True) and complete. Bytes that are not UTF-8 (Latin-1 or
+    cp1252 sources) are decoded as U+FFFD; the file on disk keeps them as uploaded.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    with open(file_path, 'wb') as out:
+        raw_head = file.stream.read(LANGUAGE_DETECTION_LIMIT)
+        complete = len(raw_head) < LANGUAGE_DETECTION_LIMIT
+        head = decoder.decode(raw_head, final=complete)
+        out.write(raw_head)
+        while chunk := file.stream.read(UPLOAD_BUFFER_SIZE):
+            out.write(chunk)
+        return out.tell(), head, complete
+
+def cache_code_content(file_path, code_content):
+    with _code_cache_lock:
+        _code_cache[file_path] = code_content
+        _code_cache.move_to_end(file_path)
+        while len(_code_cache) > CODE_CACHE_SIZE:
+            _code_cache.popitem(last=False)
+
+def get_code_content(analysis):
+    """Decoded code of an analysis, from the upload cache or read from its file"""
+    with _code_cache_lock:
+        code_content = _code_cache.get(analysis.file_path)
+        if code_content is not None:
+            _code_cache.move_to_end(analysis.file_path)
+            return code_content
+    with open(analysis.file_path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+def json_with_documents(data, **documents):
+    """Encode a dict as a JSON object, appending fields whose values are already JSON text (None as {})"""
+    parts = [orjson.dumps(data)[:-1]]
+    for name, document in documents.items():
+        separator = b',' if len(parts) > 1 or data else b''
+        parts.append(separator + orjson.dumps(name) + b':' + (document or '{}').encode())
+    parts.append(b'}')
+    return b''.join(parts)
 
 def get_or_create_session_id():
     """Get or create session ID for user settings"""
@@ -38,29 +119,204 @@ def get_user_settings():
         db.session.commit()
     return settings
 
+@dataclass(frozen=True, slots=True)
+class SettingsSnapshot:
+    """Read-only copy of a session's UserSettings row"""
+    session_id: str
+    ai_provider: str
+    ai_model: str
+    api_keys: str  # encrypted, as stored; None when no keys are saved
+
+# Settings snapshots per session, so pages that only read settings skip the
+# SELECT. An entry is valid while its version matches the one in the (signed)
+# session cookie, which update_settings replaces; other workers holding the old
+# version then reload too.
+SETTINGS_CACHE_SIZE = 10_000
+_settings_cache = OrderedDict()  # session_id -> (version, snapshot)
+_settings_cache_lock = threading.Lock()
+
+def load_user_settings():
+    """Current session's settings for reading, from memory while they are unchanged"""
+    session_id = get_or_create_session_id()
+    version = session.get('settings_version')
+    with _settings_cache_lock:
+        entry = _settings_cache.get(session_id)
+        if entry is not None and version is not None and entry[0] == version:
+            _settings_cache.move_to_end(session_id)
+            return entry[1]
+    
+    settings = get_user_settings()
+    snapshot = SettingsSnapshot(settings.session_id, settings.ai_provider, settings.ai_model, settings.api_keys)
+    if version is None:
+        version = session['settings_version'] = secrets.token_hex(8)
+    with _settings_cache_lock:
+        _settings_cache[session_id] = (version, snapshot)
+        _settings_cache.move_to_end(session_id)
+        while len(_settings_cache) > SETTINGS_CACHE_SIZE:
+            _settings_cache.popitem(last=False)
+    return snapshot
+
+def settings_changed():
+    """Invalidate cached snapshots of the current session's settings in every worker"""
+    session['settings_version'] = secrets.token_hex(8)
+    with _settings_cache_lock:
+        _settings_cache.pop(session.get('session_id'), None)
+
+def load_api_key_cipher():
+    """Build the cipher for stored API keys once from ENCRYPTION_KEY.
+
+    ENCRYPTION_KEY may list several comma-separated keys to rotate them: the
+    first encrypts, all of them decrypt. Every worker must use the same keys,
+    so a missing ENCRYPTION_KEY stops the app instead of falling back to a
+    random per-process key.
+    """
+    keys = [key.strip() for key in os.environ.get('ENCRYPTION_KEY', '').split(',') if key.strip()]
+    if not keys:
+        raise RuntimeError(
+            "ENCRYPTION_KEY is not set; generate one with "
+            "python -c 'from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())'"
+        )
+    return MultiFernet([Fernet(key) for key in keys])
+
+API_KEY_CIPHER = load_api_key_cipher()
+
 def encrypt_api_keys(api_keys_dict):
     """Encrypt API keys for storage"""
     if not api_keys_dict:
         return None
-    key = os.environ.get('ENCRYPTION_KEY', Fernet.generate_key())
-    f = Fernet(key)
-    return f.encrypt(json.dumps(api_keys_dict).encode()).decode()
+    return API_KEY_CIPHER.encrypt(orjson.dumps(api_keys_dict)).decode()
 
 def decrypt_api_keys(encrypted_keys):
     """Decrypt API keys from storage"""
     if not encrypted_keys:
         return {}
     try:
-        key = os.environ.get('ENCRYPTION_KEY', Fernet.generate_key())
-        f = Fernet(key)
-        return json.loads(f.decrypt(encrypted_keys.encode()).decode())
-    except:
+        return orjson.loads(API_KEY_CIPHER.decrypt(encrypted_keys.encode()))
+    except InvalidToken:
+        logger.error("Stored API keys could not be decrypted; was ENCRYPTION_KEY changed without keeping the old key?")
         return {}
 
+# Decrypted API keys per session, so Fernet runs once per settings change rather than per request
+API_KEY_CACHE_SIZE = 10_000
+API_KEY_CACHE_TTL = 300
+_api_key_cache = OrderedDict()  # session_id -> (expires_at, encrypted keys, decrypted keys)
+_api_key_cache_lock = threading.Lock()
+
+def get_api_keys(settings):
+    """Decrypted API keys for a settings row, cached until they expire or the stored keys change"""
+    now = time.monotonic()
+    with _api_key_cache_lock:
+        entry = _api_key_cache.get(settings.session_id)
+        if entry is not None and entry[0] > now and entry[1] == settings.api_keys:
+            _api_key_cache.move_to_end(settings.session_id)
+            return dict(entry[2])
+    
+    api_keys = decrypt_api_keys(settings.api_keys)
+    with _api_key_cache_lock:
+        _api_key_cache[settings.session_id] = (now + API_KEY_CACHE_TTL, settings.api_keys, api_keys)
+        _api_key_cache.move_to_end(settings.session_id)
+        while len(_api_key_cache) > API_KEY_CACHE_SIZE:
+            _api_key_cache.popitem(last=False)
+    return dict(api_keys)
+
+def store_analysis_results(analysis, ai_model, quality_analysis, test_suggestions, code_suggestions):
+    """Write AI results and quality metrics onto an analysis (the caller commits)"""
+    analysis.analysis_result = {
+        'quality_analysis': quality_analysis,
+        'code_suggestions': code_suggestions
+    }
+    analysis.test_suggestions = test_suggestions
+    analysis.quality_score = quality_analysis.get('quality_score', 0)
+    analysis.issues_count = len(quality_analysis.get('issues', []))
+    analysis.suggestions_count = len(code_suggestions.get('refactoring_suggestions', []))
+    analysis.ai_model = ai_model
+    
+    # Store metrics, all rows in one INSERT
+    metrics = quality_analysis.get('metrics', {})
+    if metrics:
+        db.session.execute(insert(AnalysisMetrics), [
+            {
+                'analysis_id': analysis.id,
+                'metric_name': metric_name,
+                'metric_value': str(metric_value),
+                'metric_type': 'quality'
+            }
+            for metric_name, metric_value in metrics.items()
+        ])
+
+# Loader options for analysis lists: the result documents are never rendered
+# there, and any lazy relationship load raises instead of running per row
+ANALYSIS_LIST_OPTIONS = (
+    defer(CodeAnalysis.analysis_result, raiseload=True),
+    defer(CodeAnalysis.test_suggestions, raiseload=True),
+    raiseload('*')
+)
+
+# Analysis History rows per dashboard page (?page_size= may ask for up to the maximum)
+DASHBOARD_PAGE_SIZE = 50
+DASHBOARD_MAX_PAGE_SIZE = 200
+
+# Most SQL statements each page may run before the query counter complains
+QUERY_BUDGETS = {
+    'index': 1,
+    'dashboard': 3,
+    'view_analysis': 1,
+    'analysis_content': 1,
+    'export_analysis': 2
+}
+
+if query_counter_enabled(app):
+    init_query_counter(app, QUERY_BUDGETS)
+
+# INSERT ... ON CONFLICT DO NOTHING for the databases that support it
+_INSERT_IGNORE = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+def content_hash(code_content):
+    """SHA-256 of the code, the key of stored AI results"""
+    return hashlib.sha256(code_content.encode('utf-8')).hexdigest()
+
+def load_cached_results(code_hash, language, provider, model):
+    """Stored AI results for this code, model and prompt version, keyed like analyze_all's, or None"""
+    entry = AnalysisCache.query.filter_by(
+        content_hash=code_hash, language=language, provider=provider,
+        model=model, prompt_version=PROMPT_VERSION
+    ).first()
+    if entry is None:
+        return None
+    return {
+        'analyze_code_quality': entry.quality_analysis,
+        'generate_test_cases': entry.test_suggestions,
+        'get_code_suggestions': entry.code_suggestions
+    }
+
+def save_cached_results(code_hash, language, provider, model, results):
+    """Store complete AI results for reuse (the caller commits)"""
+    if any('error' in result for result in results.values()):
+        return
+    values = dict(
+        content_hash=code_hash, language=language, provider=provider,
+        model=model, prompt_version=PROMPT_VERSION,
+        quality_analysis=results['analyze_code_quality'],
+        test_suggestions=results['generate_test_cases'],
+        code_suggestions=results['get_code_suggestions']
+    )
+    # Another request may have stored the same code meanwhile; its row stays
+    insert = _INSERT_IGNORE.get(db.engine.dialect.name)
+    if insert is not None:
+        db.session.execute(insert(AnalysisCache).values(**values).on_conflict_do_nothing())
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(AnalysisCache(**values))
+    except IntegrityError:
+        pass
+
 @app.route('/')
 def index():
     """Home page with recent analyses."""
-    recent_analyses = CodeAnalysis.query.order_by(CodeAnalysis.created_at.desc()).limit(5).all()
+    recent_analyses = db.session.execute(
+        select(CodeAnalysis).options(*ANALYSIS_LIST_OPTIONS).order_by(CodeAnalysis.created_at.desc()).limit(5)
+    ).scalars().all()
     return render_template('index.html', recent_analyses=recent_analyses)
 
 @app.route('/upload')
@@ -88,11 +344,7 @@ def upload_file():
             unique_filename = timestamp + filename
             file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
             
-            file.save(file_path)
-            
-            # Read file content
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                code_content = f.read()
+            file_size, code_content, complete = save_upload(file, file_path)
             
             # Detect language
             language = detect_language(filename, code_content)
@@ -103,11 +355,13 @@ def upload_file():
                 original_filename=filename,
                 file_path=file_path,
                 language=language,
-                file_size=len(code_content)
+                file_size=file_size
             )
             
             db.session.add(analysis)
             db.session.commit()
+            if complete:
+                cache_code_content(file_path, code_content)
             
             flash('File uploaded successfully! Starting analysis...', 'success')
             return redirect(url_for('analyze_file', analysis_id=analysis.id))
@@ -126,11 +380,11 @@ def analyze_file(analysis_id):
         analysis = CodeAnalysis.query.get_or_404(analysis_id)
         
         # Get user settings
-        settings = get_user_settings()
-        api_keys = decrypt_api_keys(settings.api_keys)
+        settings = load_user_settings()
+        api_keys = get_api_keys(settings)
         
         # Check if user has configured API key for selected provider
-        required_key = get_available_providers()[settings.ai_provider]['api_key_env']
+        required_key = PROVIDERS[settings.ai_provider].api_key_env
         api_key = api_keys.get(required_key) or os.environ.get(required_key)
         
         if not api_key:
@@ -138,39 +392,25 @@ def analyze_file(analysis_id):
             return redirect(url_for('settings_page'))
         
         # Read file content
-        with open(analysis.file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            code_content = f.read()
-        
-        # Create AI provider instance
-        ai_provider = create_ai_provider(settings.ai_provider, api_key, settings.ai_model)
+        code_content = get_code_content(analysis)
         
-        # Perform AI analysis
-        quality_analysis = ai_provider.analyze_code_quality(code_content, analysis.language)
-        test_suggestions = ai_provider.generate_test_cases(code_content, analysis.language)
-        code_suggestions = ai_provider.get_code_suggestions(code_content, analysis.language)
+        # Reuse the results of an earlier analysis of the same code, if any
+        code_hash = content_hash(code_content)
+        results = load_cached_results(code_hash, analysis.language, settings.ai_provider, settings.ai_model)
+        if results is None:
+            # Create AI provider instance
+            ai_provider = create_ai_provider(settings.ai_provider, api_key, settings.ai_model)
+            
+            # Perform AI analysis (the three reports are requested concurrently)
+            results = ai_provider.analyze_all(code_content, analysis.language)
+            save_cached_results(code_hash, analysis.language, settings.ai_provider, settings.ai_model, results)
+        quality_analysis = results['analyze_code_quality']
+        test_suggestions = results['generate_test_cases']
+        code_suggestions = results['get_code_suggestions']
         
         # Store results
-        analysis.analysis_result = json.dumps({
-            'quality_analysis': quality_analysis,
-            'code_suggestions': code_suggestions
-        })
-        analysis.test_suggestions = json.dumps(test_suggestions)
-        analysis.quality_score = quality_analysis.get('quality_score', 0)
-        analysis.issues_count = len(quality_analysis.get('issues', []))
-        analysis.suggestions_count = len(code_suggestions.get('refactoring_suggestions', []))
-        analysis.ai_model = f"{settings.ai_provider}:{settings.ai_model}"
-        
-        # Store metrics
-        metrics = quality_analysis.get('metrics', {})
-        for metric_name, metric_value in metrics.items():
-            metric = AnalysisMetrics(
-                analysis_id=analysis.id,
-                metric_name=metric_name,
-                metric_value=str(metric_value),
-                metric_type='quality'
-            )
-            db.session.add(metric)
-        
+        store_analysis_results(analysis, f"{settings.ai_provider}:{settings.ai_model}",
+                               quality_analysis, test_suggestions, code_suggestions)
         db.session.commit()
         
         flash('Analysis completed successfully!', 'success')
@@ -185,56 +425,67 @@ def view_analysis(analysis_id):
     """View detailed analysis results."""
     analysis = CodeAnalysis.query.get_or_404(analysis_id)
     
-    # Read file content for display
-    try:
-        with open(analysis.file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            code_content = f.read()
-    except:
-        code_content = "File content could not be loaded."
-    
-    # Parse JSON results
-    analysis_result = {}
-    test_suggestions = {}
-    
-    if analysis.analysis_result:
-        try:
-            analysis_result = json.loads(analysis.analysis_result)
-        except:
-            pass
-    
-    if analysis.test_suggestions:
-        try:
-            test_suggestions = json.loads(analysis.test_suggestions)
-        except:
-            pass
-    
+    # The page fetches the code itself from analysis_content
     return render_template('analysis.html', 
                          analysis=analysis, 
-                         code_content=code_content,
-                         analysis_result=analysis_result,
-                         test_suggestions=test_suggestions)
+                         analysis_result=analysis.analysis_result or {},
+                         test_suggestions=analysis.test_suggestions or {})
+
+@app.route('/analysis/<int:analysis_id>/content')
+def analysis_content(analysis_id):
+    """Serve the analyzed file as text, with ETag and range support."""
+    file_path = db.first_or_404(select(CodeAnalysis.file_path).where(CodeAnalysis.id == analysis_id))
+    try:
+        return send_file(os.path.abspath(file_path), mimetype='text/plain', conditional=True)
+    except FileNotFoundError:
+        abort(404)
 
 @app.route('/dashboard')
 def dashboard():
     """Dashboard with overview of all analyses."""
-    analyses = CodeAnalysis.query.order_by(CodeAnalysis.created_at.desc()).all()
+    # Summary statistics, computed by the database (unscored analyses count as 0)
+    (total_analyses, quality_score_sum, total_issues, total_suggestions,
+     high_quality_count, needs_work_count) = db.session.execute(
+        select(
+            func.count(CodeAnalysis.id),
+            func.coalesce(func.sum(func.coalesce(CodeAnalysis.quality_score, 0)), 0),
+            func.coalesce(func.sum(func.coalesce(CodeAnalysis.issues_count, 0)), 0),
+            func.coalesce(func.sum(func.coalesce(CodeAnalysis.suggestions_count, 0)), 0),
+            func.count(case((CodeAnalysis.quality_score > 80, 1))),
+            func.count(case((CodeAnalysis.quality_score < 60, 1)))
+        )
+    ).one()
+    avg_quality_score = quality_score_sum / max(total_analyses, 1)
     
-    # Calculate summary statistics
-    total_analyses = len(analyses)
-    avg_quality_score = sum(a.quality_score or 0 for a in analyses) / max(total_analyses, 1)
-    total_issues = sum(a.issues_count or 0 for a in analyses)
+    # Only the requested page of the history is loaded
+    page_size = min(max(request.args.get('page_size', DASHBOARD_PAGE_SIZE, type=int), 1), DASHBOARD_MAX_PAGE_SIZE)
+    pages = max(math.ceil(total_analyses / page_size), 1)
+    page = min(max(request.args.get('page', 1, type=int), 1), pages)
+    analyses = db.session.execute(
+        select(CodeAnalysis)
+        .options(*ANALYSIS_LIST_OPTIONS)
+        .order_by(CodeAnalysis.created_at.desc(), CodeAnalysis.id.desc())
+        .limit(page_size)
+        .offset((page - 1) * page_size)
+    ).scalars().all()
     
     # Language distribution
-    language_stats = {}
-    for analysis in analyses:
-        lang = analysis.language or 'unknown'
-        language_stats[lang] = language_stats.get(lang, 0) + 1
+    language = func.coalesce(CodeAnalysis.language, 'unknown')
+    language_stats = dict(db.session.execute(
+        select(language, func.count(CodeAnalysis.id)).group_by(language).order_by(func.count(CodeAnalysis.id).desc())
+    ).all())
     
     return render_template('dashboard.html', 
                          analyses=analyses,
+                         page=page,
+                         pages=pages,
+                         page_size=page_size,
                          total_analyses=total_analyses,
                          avg_quality_score=round(avg_quality_score, 1),
                          total_issues=total_issues,
+                         total_suggestions=total_suggestions,
+                         high_quality_count=high_quality_count,
+                         needs_work_count=needs_work_count,
                          language_stats=language_stats)
 
 @app.route('/delete/<int:analysis_id>', methods=['POST'])
@@ -263,7 +514,25 @@ def delete_analysis(analysis_id):
 @app.route('/export/<int:analysis_id>')
 def export_analysis(analysis_id):
     """Export analysis results as JSON."""
-    analysis = CodeAnalysis.query.get_or_404(analysis_id)
+    # The result documents are fetched as their stored JSON text and copied into
+    # the response as is, instead of being decoded only to be encoded again
+    row = db.session.execute(
+        select(
+            CodeAnalysis,
+            cast(CodeAnalysis.analysis_result, Text),
+            cast(CodeAnalysis.test_suggestions, Text)
+        )
+        .where(CodeAnalysis.id == analysis_id)
+        .options(
+            defer(CodeAnalysis.analysis_result, raiseload=True),
+            defer(CodeAnalysis.test_suggestions, raiseload=True),
+            selectinload(CodeAnalysis.metrics),
+            raiseload('*')
+        )
+    ).first()
+    if row is None:
+        abort(404)
+    analysis, analysis_result, test_suggestions = row
     
     export_data = {
         'filename': analysis.original_filename,
@@ -272,8 +541,6 @@ def export_analysis(analysis_id):
         'issues_count': analysis.issues_count,
         'suggestions_count': analysis.suggestions_count,
         'created_at': analysis.created_at.isoformat(),
-        'analysis_result': json.loads(analysis.analysis_result) if analysis.analysis_result else {},
-        'test_suggestions': json.loads(analysis.test_suggestions) if analysis.test_suggestions else {},
         'metrics': [
             {
                 'name': m.metric_name,
@@ -284,28 +551,29 @@ def export_analysis(analysis_id):
         ]
     }
     
-    return jsonify(export_data)
+    return app.response_class(
+        json_with_documents(export_data, analysis_result=analysis_result, test_suggestions=test_suggestions),
+        mimetype='application/json'
+    )
 
 @app.route('/providers')
 def providers_page():
     """AI providers and models information page."""
-    providers = get_available_providers()
-    return render_template('providers.html', providers=providers)
+    return render_template('providers.html', providers=get_available_providers())
 
 @app.route('/settings')
 def settings_page():
     """Settings page for AI provider configuration."""
-    settings = get_user_settings()
-    api_keys = decrypt_api_keys(settings.api_keys)
+    settings = load_user_settings()
+    api_keys = get_api_keys(settings)
     providers = get_available_providers()
     
     # Pre-select provider if specified in query params
     selected_provider = request.args.get('provider')
     if selected_provider and selected_provider in providers:
-        settings.ai_provider = selected_provider
         # Set default model for the provider
-        default_model = list(providers[selected_provider]['models'].keys())[0]
-        settings.ai_model = default_model
+        default_model = next(iter(providers[selected_provider].models))
+        settings = replace(settings, ai_provider=selected_provider, ai_model=default_model)
     
     return render_template('settings.html', 
                          settings=settings,
@@ -323,11 +591,10 @@ def update_settings():
         settings.ai_model = request.form.get('ai_model', 'gpt-4o')
         
         # Update API keys
-        api_keys = decrypt_api_keys(settings.api_keys) or {}
+        api_keys = get_api_keys(settings)
         
         # Get all potential API keys from form
-        for provider, provider_info in get_available_providers().items():
-            api_key_field = provider_info['api_key_env']
+        for api_key_field in API_KEY_FIELDS:
             api_key_value = request.form.get(api_key_field)
             if api_key_value and api_key_value.strip():
                 api_keys[api_key_field] = api_key_value.strip()
@@ -336,6 +603,7 @@ def update_settings():
         settings.api_keys = encrypt_api_keys(api_keys)
         
         db.session.commit()
+        settings_changed()
         flash('Settings updated successfully!', 'success')
         
     except Exception as e:
@@ -360,6 +628,77 @@ def validate_api_key_route():
     except Exception as e:
         return jsonify({'valid': False, 'error': str(e)})
 
+@app.route('/validate_api_keys', methods=['POST'])
+def validate_api_keys_route():
+    """Validate the API keys of several providers at once."""
+    try:
+        data = request.get_json()
+        keys = {provider: api_key for provider, api_key in (data.get('keys') or {}).items() if api_key}
+        
+        if not keys:
+            return jsonify({'results': {}, 'error': 'No API keys to validate'})
+        
+        results = asyncio.run(validate_all_api_keys(keys))
+        return jsonify({'results': results})
+        
+    except Exception as e:
+        return jsonify({'results': {}, 'error': str(e)})
+
+@app.route('/rate_limits')
+def rate_limits():
+    """Provider call load in this worker for the API keys stored in this session."""
+    api_keys = get_api_keys(load_user_settings())
+    return jsonify({'limiters': limiter_stats(api_keys.values())})
+
+@app.cli.command('backfill-analyses')
+@click.option('--provider', default='openai', help='AI provider to analyze with.')
+@click.option('--model', default='gpt-4o', help='Model to analyze with.')
+@click.option('--limit', default=1000, help='Maximum number of files to analyze.')
+def backfill_analyses(provider, model, limit):
+    """Analyze every uploaded file that has no results yet."""
+    providers = PROVIDERS
+    if provider not in providers:
+        raise click.ClickException(f'Unknown provider: {provider}')
+    api_key = os.environ.get(providers[provider].api_key_env)
+    if not api_key:
+        raise click.ClickException(f'{providers[provider].api_key_env} is not set')
+    
+    pending = []
+    codes = []
+    for analysis in CodeAnalysis.query.filter(CodeAnalysis.analysis_result.is_(None)).order_by(CodeAnalysis.id).limit(limit):
+        try:
+            with open(analysis.file_path, 'r', encoding='utf-8', errors='replace') as f:
+                codes.append((f.read(), analysis.language))
+        except OSError:
+            continue
+        pending.append(analysis)
+    if not pending:
+        click.echo('No pending analyses.')
+        return
+    
+    # Small queues are answered right away; larger ones go through the
+    # vendor batch APIs at half the token price
+    use_batch_api = len(pending) >= BATCH_QUEUE_THRESHOLD
+    processor = BatchProcessor(provider, api_key, model)
+    
+    async def run_all():
+        return await asyncio.gather(*(
+            processor.run_batch(method_name, codes, use_batch_api=use_batch_api)
+            for method_name in ANALYSIS_METHODS
+        ))
+    
+    quality_results, test_results, suggestion_results = asyncio.run(run_all())
+    
+    analyzed = 0
+    for analysis, quality_analysis, test_suggestions, code_suggestions in zip(
+            pending, quality_results, test_results, suggestion_results):
+        if any('error' in result for result in (quality_analysis, test_suggestions, code_suggestions)):
+            continue
+        store_analysis_results(analysis, f"{provider}:{model}", quality_analysis, test_suggestions, code_suggestions)
+        analyzed += 1
+    db.session.commit()
+    click.echo(f'Analyzed {analyzed} of {len(pending)} pending files.')
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('404.html'), 404
@@ -0,0 +1,11 @@
+import os
+
+from cryptography.fernet import Fernet
+
+# Read when the app is imported: run it on an in-memory database, without
+# opening provider connections, and fail any request over its query budget
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['ENCRYPTION_KEY'] = Fernet.generate_key().decode()
+os.environ['AI_PREWARM_CONNECTIONS'] = '0'
+os.environ['SQL_QUERY_COUNT'] = '1'
+os.environ['SQL_QUERY_COUNT_RAISE'] = '1'
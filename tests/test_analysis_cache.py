@@ -0,0 +1,85 @@
+import io
+
+import pytest
+
+import routes
+from ai_service import PROMPT_VERSION
+from app import app, db
+from models import AnalysisCache, CodeAnalysis
+
+RESULTS = {
+    'analyze_code_quality': {'quality_score': 85, 'issues': [{'line': 1}], 'metrics': {'complexity': 'low'}},
+    'generate_test_cases': {'test_cases': []},
+    'get_code_suggestions': {'refactoring_suggestions': [{'title': 'rename'}]}
+}
+
+
+class FakeProvider:
+    def __init__(self):
+        self.calls = 0
+
+    def analyze_all(self, code_content, language):
+        self.calls += 1
+        return RESULTS
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = FakeProvider()
+    monkeypatch.setattr(routes, 'create_ai_provider', lambda name, api_key, model: provider)
+    monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+    return provider
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    app.config['TESTING'] = True
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    yield app.test_client()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+
+def _upload_and_analyze(client, data=b'def f():\n    return 1\n'):
+    response = client.post('/upload', data={'file': (io.BytesIO(data), 'example.py')},
+                           content_type='multipart/form-data')
+    analysis_id = int(response.location.rsplit('/', 1)[1])
+    response = client.get(f'/analyze/{analysis_id}')
+    assert response.location.endswith(f'/analysis/{analysis_id}')
+    return analysis_id
+
+
+def _cache_rows():
+    with app.app_context():
+        return db.session.scalars(db.select(AnalysisCache)).all()
+
+
+def test_same_code_reuses_the_stored_results(client, provider):
+    first = _upload_and_analyze(client)
+    assert provider.calls == 1
+    assert len(_cache_rows()) == 1
+
+    second = _upload_and_analyze(client)
+    assert provider.calls == 1
+    assert len(_cache_rows()) == 1
+    with app.app_context():
+        analysis = db.session.get(CodeAnalysis, second)
+        assert analysis.analysis_result['quality_analysis'] == RESULTS['analyze_code_quality']
+        assert (analysis.quality_score, analysis.issues_count, analysis.suggestions_count) == (85, 1, 1)
+    assert first != second
+
+
+def test_different_code_misses(client, provider):
+    _upload_and_analyze(client)
+    _upload_and_analyze(client, b'def g():\n    return 2\n')
+    assert provider.calls == 2
+    assert len(_cache_rows()) == 2
+
+
+def test_prompt_version_bump_misses(client, provider, monkeypatch):
+    _upload_and_analyze(client)
+    monkeypatch.setattr(routes, 'PROMPT_VERSION', 'next-prompts')
+    _upload_and_analyze(client)
+    assert provider.calls == 2
+    assert sorted(row.prompt_version for row in _cache_rows()) == sorted([PROMPT_VERSION, 'next-prompts'])
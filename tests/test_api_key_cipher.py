@@ -0,0 +1,29 @@
+import logging
+
+import pytest
+from cryptography.fernet import Fernet, MultiFernet
+
+import routes
+
+
+def test_missing_encryption_key_stops_the_app(monkeypatch):
+    monkeypatch.delenv('ENCRYPTION_KEY')
+    with pytest.raises(RuntimeError, match='ENCRYPTION_KEY'):
+        routes.load_api_key_cipher()
+
+
+def test_rotated_keys_still_decrypt(monkeypatch):
+    old_key, new_key = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+    monkeypatch.setattr(routes, 'API_KEY_CIPHER', MultiFernet([Fernet(old_key)]))
+    stored = routes.encrypt_api_keys({'OPENAI_API_KEY': 'sk-old'})
+
+    monkeypatch.setenv('ENCRYPTION_KEY', f'{new_key},{old_key}')
+    monkeypatch.setattr(routes, 'API_KEY_CIPHER', routes.load_api_key_cipher())
+    assert routes.decrypt_api_keys(stored) == {'OPENAI_API_KEY': 'sk-old'}
+
+
+def test_undecryptable_keys_are_logged(monkeypatch, caplog):
+    stored = MultiFernet([Fernet(Fernet.generate_key())]).encrypt(b'{"OPENAI_API_KEY": "sk"}').decode()
+    with caplog.at_level(logging.ERROR, logger='routes'):
+        assert routes.decrypt_api_keys(stored) == {}
+    assert 'could not be decrypted' in caplog.text
@@ -0,0 +1,105 @@
+import pytest
+
+import code_budget
+import code_chunks
+from code_chunks import map_reduce, merge_reports, split_code
+
+PYTHON_SOURCE = '''import os
+
+
+def first():
+    return 1
+
+
+@decorator
+def second():
+    return 2
+
+
+class Third:
+    def method(self):
+        return 3
+'''
+
+
+@pytest.fixture(autouse=True)
+def line_tokens(monkeypatch):
+    """One token per line, so chunk sizes do not depend on the tokenizer"""
+    def count_lines(text):
+        return text.count('\n') + (not text.endswith('\n') and bool(text))
+    monkeypatch.setattr(code_chunks, 'count_tokens', count_lines)
+    monkeypatch.setattr(code_budget, 'count_tokens', count_lines)
+
+
+def test_python_splits_at_top_level_definitions():
+    chunks = split_code(PYTHON_SOURCE, 'python', max_tokens=5)
+
+    assert ''.join(text for _, text in chunks) == PYTHON_SOURCE
+    lines = PYTHON_SOURCE.splitlines(keepends=True)
+    for offset, text in chunks:
+        assert ''.join(lines[offset:offset + text.count('\n')]) == text
+    # The decorator starts its definition's chunk
+    assert any(text.startswith('@decorator') for _, text in chunks)
+    assert [offset for offset, _ in chunks] == [0, 3, 7, 12]
+
+
+def test_oversized_python_definition_stays_whole():
+    source = 'def big():\n' + '    x = 1\n' * 10 + '\n\ndef small():\n    pass\n'
+    chunks = split_code(source, 'python', max_tokens=4)
+
+    assert chunks[0] == (0, 'def big():\n' + '    x = 1\n' * 10 + '\n\n')
+    assert chunks[1] == (13, 'def small():\n    pass\n')
+
+
+def test_oversized_block_in_other_languages_is_cut_between_lines():
+    source = ''.join(f'line{i};\n' for i in range(10))
+    chunks = split_code(source, 'javascript', max_tokens=4)
+
+    assert [offset for offset, _ in chunks] == [0, 4, 8]
+    assert ''.join(text for _, text in chunks) == source
+
+
+def test_merge_shifts_issue_lines_to_file_positions():
+    chunks = [(0, 'a\nb\nc'), (3, 'd')]
+    reports = [
+        {'quality_score': 60, 'issues': [{'line': 2, 'message': 'x'}], 'recommendations': ['r1', 'r2'],
+         'metrics': {'complexity': 'high'}, 'summary': 'first'},
+        {'quality_score': 100, 'issues': [{'line': 1, 'message': 'y'}], 'recommendations': ['r2'],
+         'metrics': {'complexity': 'low'}, 'summary': 'second'},
+    ]
+    merged = merge_reports(reports, chunks)
+
+    assert [issue['line'] for issue in merged['issues']] == [2, 4]
+    assert merged['quality_score'] == 70.0  # weighted by chunk lines, 3:1
+    assert merged['recommendations'] == ['r1', 'r2']
+    assert merged['metrics'] == {'complexity': 'high'}
+    assert merged['summary'] == 'first second'
+    # The chunk reports are left untouched
+    assert reports[1]['issues'][0]['line'] == 1
+
+
+def test_merge_skips_failed_chunks():
+    chunks = [(0, 'a'), (1, 'b')]
+    merged = merge_reports([{'error': 'timeout'}, {'issues': [{'line': 1}]}], chunks)
+    assert merged == {'issues': [{'line': 2}]}
+    assert merge_reports([{'error': 'timeout'}, {'error': 'again'}], chunks) == {'error': 'timeout'}
+
+
+def test_map_reduce_runs_each_chunk_and_merges(monkeypatch):
+    monkeypatch.setattr(code_chunks, 'code_budget_for_model', lambda model: 6)
+    monkeypatch.setattr(code_chunks, 'CHUNK_TOKEN_BUDGET', 6)
+
+    class Provider:
+        model = 'small-model'
+
+        @map_reduce
+        def analyze_code_quality(self, code_content, language):
+            return {'issues': [{'line': 1, 'message': code_content.splitlines()[0]}]}
+
+    merged = Provider().analyze_code_quality(PYTHON_SOURCE, 'python')
+    assert merged['issues'] == [
+        {'line': 1, 'message': 'import os'},
+        {'line': 4, 'message': 'def first():'},
+        {'line': 8, 'message': '@decorator'},
+        {'line': 13, 'message': 'class Third:'},
+    ]
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+
+import pytest
+
+import llm_cache
+from ai_service import PROMPT_VERSION, AnthropicProvider, OpenAIProvider
+from llm_cache import MemoryBackend, llm_cache as cached
+
+
+class FakeProvider:
+    model = 'test-model'
+
+    def __init__(self, report=None):
+        self.calls = 0
+        self.report = report if report is not None else {'quality_score': 80, 'issues': [{'line': 1}]}
+
+    @cached(ttl=60)
+    def analyze_code_quality(self, code_content, language):
+        self.calls += 1
+        return self.report
+
+
+@pytest.fixture
+def backend():
+    previous = llm_cache.get_backend()
+    backend = MemoryBackend(max_entries=2)
+    llm_cache.set_backend(backend)
+    yield backend
+    llm_cache.set_backend(previous)
+
+
+def test_memory_backend_returns_copies():
+    backend = MemoryBackend()
+    value = {'issues': [{'line': 1}]}
+    backend.set('k', value, ttl=60)
+    value['issues'].append({'line': 2})
+
+    hit = backend.get('k')
+    assert hit == {'issues': [{'line': 1}]}
+    hit['issues'].clear()
+    assert backend.get('k') == {'issues': [{'line': 1}]}
+
+
+def test_memory_backend_expiry_and_eviction():
+    backend = MemoryBackend(max_entries=2)
+    backend.set('expired', {'v': 0}, ttl=-1)
+    assert backend.get('expired') is None
+
+    backend.set('a', {'v': 1}, ttl=60)
+    backend.set('b', {'v': 2}, ttl=60)
+    backend.get('a')  # 'b' is now least recently used
+    backend.set('c', {'v': 3}, ttl=60)
+    assert backend.get('b') is None
+    assert backend.get('a') == {'v': 1}
+    assert backend.get('c') == {'v': 3}
+
+
+def test_repeated_call_is_served_from_cache(backend):
+    provider = FakeProvider()
+    first = provider.analyze_code_quality('x = 1', 'python')
+    first['issues'].clear()
+
+    assert provider.analyze_code_quality('x = 1', 'python') == {'quality_score': 80, 'issues': [{'line': 1}]}
+    assert provider.calls == 1
+    provider.analyze_code_quality('x = 2', 'python')
+    assert provider.calls == 2
+
+
+def test_error_results_are_not_cached(backend):
+    provider = FakeProvider(report={'error': 'rate limited'})
+    provider.analyze_code_quality('x = 1', 'python')
+    provider.analyze_code_quality('x = 1', 'python')
+    assert provider.calls == 2
+
+
+def test_identical_call_in_flight_is_joined():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'quality_score': 90}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(llm_cache._call_once(None, 'key', 60, call)))
+    leader.start()
+    assert started.wait(5)
+
+    future, is_leader = llm_cache._join_inflight('key')
+    assert not is_leader
+    release.set()
+    leader.join(5)
+
+    assert future.result(5) == {'quality_score': 90}
+    assert results == [{'quality_score': 90}]
+    assert calls == [1]
+    assert 'key' not in llm_cache._inflight
+
+
+def test_async_callers_share_one_call():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'issues': []}
+
+    async def main():
+        return await asyncio.gather(*(llm_cache._call_once_async(None, 'async-key', 60, call) for _ in range(3)))
+
+    results = asyncio.run(main())
+    assert calls == [1]
+    assert results == [{'issues': []}] * 3
+    assert results[1] is not results[0]
+
+
+def test_leader_failure_reaches_waiting_callers():
+    async def call():
+        await asyncio.sleep(0.01)
+        raise TimeoutError('stalled')
+
+    async def main():
+        return await asyncio.gather(*(llm_cache._call_once_async(None, 'failing-key', 60, call) for _ in range(2)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, TimeoutError) for r in results)
+    assert 'failing-key' not in llm_cache._inflight
+
+
+def test_prompt_change_misses_the_cache(backend, monkeypatch):
+    provider = FakeProvider()
+    provider.analyze_code_quality('x = 1', 'python')
+    monkeypatch.setattr(FakeProvider, 'prompt_fingerprint', 'new-prompts', raising=False)
+    provider.analyze_code_quality('x = 1', 'python')
+    assert provider.calls == 2
+
+
+def test_prompt_fingerprint_covers_prompts_and_response_format():
+    structured = OpenAIProvider('sk-test', 'gpt-4o').prompt_fingerprint
+    json_mode = OpenAIProvider('sk-test', 'gpt-4-turbo').prompt_fingerprint
+    anthropic = AnthropicProvider('sk-test', 'claude-3-5-sonnet-20241022').prompt_fingerprint
+
+    assert all(PROMPT_VERSION in fingerprint for fingerprint in (structured, json_mode, anthropic))
+    assert len({structured, json_mode, anthropic}) == 3
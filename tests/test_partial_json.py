@@ -0,0 +1,67 @@
+import orjson
+import pytest
+
+from ai_service import _partial_reports, _read_document
+from partial_json import JSONDocumentEnd, parse_partial_json
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('', None),
+    ('{', {}),
+    ('{"a": 1, "b": [1, 2', {'a': 1, 'b': [1]}),
+    ('{"a": 1, "b": [1, 2]', {'a': 1, 'b': [1, 2]}),
+    ('{"a": "he', {'a': 'he'}),
+    ('{"a": tr', {}),
+    ('{"a": 1, "b"', {'a': 1}),
+    ('{"q": 8', {}),
+    ('{"a": {"b": "c\\', {'a': {'b': 'c'}}),
+    ('{"a": "}]"', {'a': '}]'}),
+])
+def test_partial_document_is_closed(text, expected):
+    assert parse_partial_json(text) == expected
+
+
+def test_document_end_ignores_brackets_in_strings():
+    document = JSONDocumentEnd()
+    assert document.feed('{"a": "}\\"]", ') == -1
+    assert not document.complete
+    assert document.feed('"b": [1]}  and some prose') == 9
+    assert document.complete
+
+
+def test_document_end_spans_deltas():
+    document = JSONDocumentEnd()
+    ends = [document.feed(delta) for delta in ['[', '{"x":', ' 1}', ']\n', 'more']]
+    assert ends == [-1, -1, -1, 1, -1]
+
+
+def _deltas(text, size, pulled):
+    for start in range(0, len(text), size):
+        pulled.append(start)
+        yield text[start:start + size]
+
+
+def test_stream_is_abandoned_after_the_document():
+    report = {'quality_score': 80, 'summary': 'fine'}
+    text = orjson.dumps(report).decode() + '\n\nHere is an explanation of the report that goes on ' + 'and on ' * 50
+    pulled = []
+
+    document = _read_document(_deltas(text, 8, pulled))
+
+    assert orjson.loads(document) == report
+    # Reading stops at the first delta of prose after the document, not at the end of the stream
+    assert pulled[-1] <= len(document) + 8
+    assert pulled[-1] < len(text) - 8
+
+
+def test_partial_reports_end_with_the_full_report(monkeypatch):
+    monkeypatch.setattr('ai_service.STREAM_UPDATE_INTERVAL', 0)
+    report = {'issues': [{'line': 1}, {'line': 2}], 'summary': 'done'}
+    text = orjson.dumps(report).decode() + ' trailing text'
+
+    snapshots = list(_partial_reports(_deltas(text, 5, []), orjson.loads))
+
+    assert snapshots[-1] == report
+    assert all(isinstance(snapshot, dict) for snapshot in snapshots)
+    # The issues arrive before the summary does
+    assert {'issues': [{'line': 1}, {'line': 2}]} in snapshots
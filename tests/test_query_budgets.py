@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import template_rendered
+
+from app import app, db
+from models import CodeAnalysis
+from query_counter import QueryBudgetExceeded
+from routes import QUERY_BUDGETS, store_analysis_results
+
+UPLOADED = datetime(2024, 1, 1, 12, 0)
+QUALITY = {
+    'quality_score': 85,
+    'issues': [{'type': 'warning', 'severity': 'low', 'line': 2, 'message': 'm', 'suggestion': 's'}],
+    'metrics': {'complexity': 'low', 'maintainability': 80, 'readability': 75, 'security': 90},
+    'summary': 'ok',
+    'recommendations': ['r'],
+}
+TESTS = {'test_framework': 'pytest', 'test_cases': [], 'coverage_suggestions': [], 'mocking_suggestions': []}
+SUGGESTIONS = {'refactoring_suggestions': [], 'architecture_suggestions': [], 'dependency_suggestions': []}
+
+
+@pytest.fixture
+def analyses(tmp_path):
+    """A few analyzed files, one uploaded a minute after the other, plus one still waiting for analysis"""
+    app.config['TESTING'] = True
+    with app.app_context():
+        ids = []
+        for index, language in enumerate(['python', 'python', 'javascript', 'go', 'python']):
+            path = tmp_path / f'file{index}.txt'
+            path.write_text(f'x = {index}\n')
+            analysis = CodeAnalysis(filename=path.name, original_filename=path.name, file_path=str(path),
+                                    language=language, file_size=path.stat().st_size,
+                                    created_at=UPLOADED + timedelta(minutes=index))
+            db.session.add(analysis)
+            db.session.flush()
+            if index < 4:
+                store_analysis_results(analysis, 'gpt-4o', QUALITY, TESTS, SUGGESTIONS)
+            ids.append(analysis.id)
+        db.session.commit()
+    yield ids
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+
+def _query_count(path):
+    response = app.test_client().get(path)
+    assert response.status_code == 200, response.data[:200]
+    return int(response.headers['X-Query-Count'])
+
+
+def _dashboard(path):
+    """Response and template context of a dashboard request"""
+    rendered = []
+
+    def record(sender, template, context, **extra):
+        rendered.append(context)
+    with template_rendered.connected_to(record, app):
+        response = app.test_client().get(path)
+    assert response.status_code == 200, response.data[:200]
+    return response, rendered[0]
+
+
+def test_dashboard_query_budget(analyses):
+    response, context = _dashboard('/dashboard')
+    assert int(response.headers['X-Query-Count']) <= 3
+    assert [a.filename for a in context['analyses']] == [f'file{index}.txt' for index in (4, 3, 2, 1, 0)]
+    assert (context['page'], context['pages']) == (1, 1)
+
+
+def test_dashboard_pages_query_budget(analyses):
+    response, context = _dashboard('/dashboard?page=2&page_size=2')
+    assert int(response.headers['X-Query-Count']) <= 3
+    # Newest first: page 2 holds the third and fourth newest uploads
+    assert [a.filename for a in context['analyses']] == ['file2.txt', 'file1.txt']
+    assert (context['page'], context['pages'], context['page_size']) == (2, 3, 2)
+    assert context['total_analyses'] == 5
+    assert b'file2.txt' in response.data and b'file4.txt' not in response.data
+
+    response, context = _dashboard('/dashboard?page=3&page_size=2')
+    assert int(response.headers['X-Query-Count']) <= 3
+    assert [a.filename for a in context['analyses']] == ['file0.txt']
+
+
+def test_export_query_budget(analyses):
+    for analysis_id in analyses:
+        assert _query_count(f'/export/{analysis_id}') <= 2
+
+
+def test_view_analysis_query_budget(analyses):
+    for analysis_id in analyses:
+        assert _query_count(f'/analysis/{analysis_id}') <= QUERY_BUDGETS['view_analysis']
+        assert _query_count(f'/analysis/{analysis_id}/content') <= QUERY_BUDGETS['analysis_content']
+
+
+def test_exceeding_a_budget_fails_the_request(analyses, monkeypatch):
+    monkeypatch.setitem(QUERY_BUDGETS, 'dashboard', 0)
+    with pytest.raises(QueryBudgetExceeded):
+        app.test_client().get('/dashboard')
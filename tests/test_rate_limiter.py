@@ -0,0 +1,185 @@
+import asyncio
+
+import pytest
+
+import rate_limiter
+from rate_limiter import WINDOW_SECONDS, RateLimiter, get_limiter, rate_limited
+
+
+class FakeClock:
+    """Stands in for the time module: sleeping advances the clock instead of blocking"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+    return clock
+
+
+def _acquire_and_release(limiter, tokens=0):
+    limiter.acquire(tokens)
+    limiter.release()
+
+
+def test_rpm_waits_for_the_window_to_slide(clock):
+    limiter = RateLimiter(max_concurrent=4, rpm=2)
+    _acquire_and_release(limiter)
+    clock.now += 10
+    _acquire_and_release(limiter)
+    assert clock.slept == []
+
+    _acquire_and_release(limiter)
+    # The third request starts once the first one leaves the window
+    assert clock.slept == [WINDOW_SECONDS - 10]
+    assert limiter.stats()['requests_last_minute'] == 2
+
+
+def test_tpm_counts_input_tokens(clock):
+    limiter = RateLimiter(max_concurrent=4, tpm=100)
+    _acquire_and_release(limiter, tokens=60)
+    _acquire_and_release(limiter, tokens=30)
+    assert limiter.stats()['tokens_last_minute'] == 90
+
+    _acquire_and_release(limiter, tokens=30)
+    assert clock.slept == [WINDOW_SECONDS]
+    assert limiter.stats()['tokens_last_minute'] == 30
+
+
+def test_oversized_request_is_admitted_on_an_empty_window(clock):
+    limiter = RateLimiter(max_concurrent=4, tpm=100)
+    _acquire_and_release(limiter, tokens=500)
+    assert clock.slept == []
+
+
+def test_unlimited_by_default(clock):
+    limiter = RateLimiter(max_concurrent=4)
+    for _ in range(100):
+        _acquire_and_release(limiter, tokens=10_000)
+    assert clock.slept == []
+
+
+def test_slot_is_released_when_the_call_fails(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'MAX_CONCURRENT_REQUESTS', 1)
+
+    class Provider:
+        api_key = 'release-on-error'
+
+        @rate_limited
+        def analyze_code_quality(self, code_content, language):
+            raise TimeoutError('stalled')
+
+    provider = Provider()
+    for _ in range(3):
+        with pytest.raises(TimeoutError):
+            provider.analyze_code_quality('x = 1', 'python')
+
+    stats = get_limiter(provider).stats()
+    assert stats['in_flight'] == 0 and stats['waiting'] == 0
+    assert get_limiter(provider)._slots.acquire(blocking=False)
+
+
+def test_interrupted_wait_gives_the_slot_back(clock):
+    limiter = RateLimiter(max_concurrent=1, rpm=1)
+    _acquire_and_release(limiter)
+
+    def interrupted(seconds):
+        raise KeyboardInterrupt
+    clock.sleep = interrupted
+    with pytest.raises(KeyboardInterrupt):
+        limiter.acquire()
+
+    assert limiter.stats()['waiting'] == 0
+    assert limiter._slots.acquire(blocking=False)
+
+
+def test_async_callers_share_the_concurrency_cap():
+    limiter = RateLimiter(max_concurrent=2)
+    running = []
+    peak = []
+
+    async def call():
+        await limiter.acquire_async()
+        try:
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.02)
+            running.pop()
+        finally:
+            limiter.release()
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(main())
+    assert max(peak) == 2
+    assert limiter.stats()['in_flight'] == 0
+
+
+def test_stats_cover_only_the_given_keys():
+    class Provider:
+        base_url = 'https://api.example.test/v1'
+
+        def __init__(self, api_key):
+            self.api_key = api_key
+
+    mine, theirs = Provider('sk-stats-mine'), Provider('sk-stats-theirs')
+    get_limiter(mine).acquire()
+    get_limiter(theirs).acquire()
+    try:
+        stats = rate_limiter.limiter_stats(['sk-stats-mine', ''])
+    finally:
+        get_limiter(mine).release()
+        get_limiter(theirs).release()
+
+    assert [(entry['provider'], entry['in_flight']) for entry in stats] == [('Provider', 1)]
+    assert stats[0]['key'] == rate_limiter._fingerprint('sk-stats-mine')[:8]
+
+
+def test_parked_coroutine_is_woken_by_release_from_another_thread():
+    limiter = RateLimiter(max_concurrent=1)
+
+    async def main():
+        limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire_async())
+        await asyncio.sleep(0.05)
+        # Parked on a single future rather than polling
+        assert not waiter.done() and len(limiter._async_waiters) == 1
+        await asyncio.get_running_loop().run_in_executor(None, limiter.release)
+        await asyncio.wait_for(waiter, 1)
+        limiter.release()
+
+    asyncio.run(main())
+    assert limiter.stats()['in_flight'] == 0 and not limiter._async_waiters
+
+
+def test_cancelled_waiter_passes_its_wake_up_on():
+    limiter = RateLimiter(max_concurrent=1)
+
+    async def main():
+        limiter.acquire()
+        first = asyncio.create_task(limiter.acquire_async())
+        second = asyncio.create_task(limiter.acquire_async())
+        await asyncio.sleep(0.01)
+        limiter.release()  # picks the first waiter...
+        first.cancel()  # ...which gives up before it runs
+        await asyncio.wait_for(second, 1)
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        limiter.release()
+
+    asyncio.run(main())
+    stats = limiter.stats()
+    assert stats['in_flight'] == 0 and stats['waiting'] == 0
+    assert limiter._slots.acquire(blocking=False)
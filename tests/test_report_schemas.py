@@ -0,0 +1,29 @@
+import msgspec
+import pytest
+
+from report_schemas import RESPONSE_FORMATS, decode_report
+
+QUALITY_REPORT = (
+    b'{"quality_score": 80, "issues": [{"type": "warning", "severity": "low", "line": null,'
+    b' "message": "m", "suggestion": "s"}], "metrics": {"complexity": "low", "maintainability": 72.5,'
+    b' "readability": 70, "security": 90}, "summary": "ok", "recommendations": []}'
+)
+
+
+def test_integral_scores_stay_integers():
+    report = decode_report(QUALITY_REPORT, 'quality')
+
+    assert report['quality_score'] == 80 and isinstance(report['quality_score'], int)
+    assert {name: str(value) for name, value in report['metrics'].items()} == {
+        'complexity': 'low', 'maintainability': '72.5', 'readability': '70', 'security': '90'
+    }
+
+
+def test_schema_accepts_integers_and_numbers():
+    schema = RESPONSE_FORMATS['quality']['json_schema']['schema']
+    assert schema['properties']['quality_score']['anyOf'] == [{'type': 'integer'}, {'type': 'number'}]
+
+
+def test_unexpected_fields_are_rejected():
+    with pytest.raises(msgspec.ValidationError):
+        decode_report(QUALITY_REPORT[:-1] + b', "extra": 1}', 'quality')
@@ -0,0 +1,63 @@
+import httpx
+import openai
+import pytest
+import tenacity
+
+from ai_service import MAX_RETRIES, TIMEOUT_RETRIES, AnthropicProvider, OpenAIProvider, ProviderAPIError, retry_transient
+
+
+def _failing(errors):
+    """A retry_transient call that raises the given errors in turn, without the backoff"""
+    calls = []
+
+    @retry_transient
+    def call():
+        calls.append(1)
+        raise errors[min(len(calls), len(errors)) - 1]
+
+    return call.retry_with(wait=tenacity.wait_none()), calls
+
+
+def _sdk_timeout():
+    request = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+    try:
+        raise httpx.ReadTimeout('stalled', request=request)
+    except httpx.ReadTimeout as err:
+        try:
+            raise openai.APITimeoutError(request=request) from err
+        except openai.APITimeoutError as sdk_error:
+            return sdk_error
+
+
+def test_timed_out_call_is_reissued_timeout_retries_times():
+    call, calls = _failing([httpx.ReadTimeout('stalled')])
+    with pytest.raises(httpx.ReadTimeout):
+        call()
+    assert len(calls) == TIMEOUT_RETRIES + 1
+
+
+def test_other_failures_do_not_count_towards_the_timeout_limit():
+    errors = [ProviderAPIError('unavailable', 503)] * 2 + [httpx.ReadTimeout('stalled')]
+    call, calls = _failing(errors)
+    with pytest.raises(httpx.ReadTimeout):
+        call()
+    assert len(calls) == 2 + TIMEOUT_RETRIES + 1
+
+
+def test_other_failures_use_the_full_budget():
+    call, calls = _failing([ProviderAPIError('unavailable', 503)])
+    with pytest.raises(ProviderAPIError):
+        call()
+    assert len(calls) == MAX_RETRIES
+
+
+def test_sdk_timeout_counts_as_a_timeout():
+    call, calls = _failing([_sdk_timeout()])
+    with pytest.raises(openai.APITimeoutError):
+        call()
+    assert len(calls) == TIMEOUT_RETRIES + 1
+
+
+def test_sdk_clients_leave_retries_to_tenacity():
+    assert OpenAIProvider('sk-test', 'gpt-4o').client.max_retries == 0
+    assert AnthropicProvider('sk-test', 'claude-3-5-sonnet-20241022').client.max_retries == 0
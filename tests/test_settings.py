@@ -0,0 +1,74 @@
+import pytest
+from flask import template_rendered
+
+import routes
+from app import app, db
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    yield app.test_client()
+    routes._settings_cache.clear()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+
+def _settings_page(client):
+    """Template context of a settings page request"""
+    rendered = []
+
+    def record(sender, template, context, **extra):
+        rendered.append(context)
+    with template_rendered.connected_to(record, app):
+        response = client.get('/settings')
+    assert response.status_code == 200
+    return rendered[0]
+
+
+def _update(client, **form):
+    response = client.post('/settings', data=form)
+    assert response.status_code == 302
+
+
+def test_first_request_gets_the_defaults(client):
+    context = _settings_page(client)
+    assert (context['settings'].ai_provider, context['settings'].ai_model) == ('openai', 'gpt-4o')
+    assert context['api_keys'] == {}
+
+
+def test_next_request_sees_updated_settings(client):
+    _settings_page(client)  # caches the defaults for this session
+    with client.session_transaction() as session:
+        version = session['settings_version']
+
+    _update(client, ai_provider='anthropic', ai_model='claude-3-5-sonnet-20241022', ANTHROPIC_API_KEY=' sk-ant-test ')
+
+    context = _settings_page(client)
+    assert (context['settings'].ai_provider, context['settings'].ai_model) == ('anthropic', 'claude-3-5-sonnet-20241022')
+    assert context['api_keys'] == {'ANTHROPIC_API_KEY': 'sk-ant-test'}
+    with client.session_transaction() as session:
+        assert session['settings_version'] != version
+
+
+def test_stale_snapshot_from_another_worker_is_reloaded(client):
+    stale = _settings_page(client)['settings']
+    with client.session_transaction() as session:
+        session_id, version = session['session_id'], session['settings_version']
+
+    _update(client, ai_provider='xai', ai_model='grok-2-1212')
+    # A worker that did not handle the update still holds the old snapshot
+    routes._settings_cache[session_id] = (version, stale)
+
+    assert _settings_page(client)['settings'].ai_provider == 'xai'
+
+
+def test_unchanged_settings_are_served_from_memory(client, monkeypatch):
+    _settings_page(client)
+
+    def unexpected():
+        raise AssertionError('settings were reloaded from the database')
+    monkeypatch.setattr(routes, 'get_user_settings', unexpected)
+
+    assert _settings_page(client)['settings'].ai_provider == 'openai'
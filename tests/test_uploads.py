@@ -0,0 +1,49 @@
+import io
+
+import pytest
+
+from ai_service import LANGUAGE_DETECTION_LIMIT
+from app import app, db
+from models import CodeAnalysis
+from routes import get_code_content
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    app.config['TESTING'] = True
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    yield app.test_client()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+
+def _upload(client, data, filename='example.py'):
+    return client.post('/upload', data={'file': (io.BytesIO(data), filename)},
+                       content_type='multipart/form-data')
+
+
+def test_upload_is_stored_unchanged(client):
+    # A multi-byte character straddling the language detection limit
+    data = b'#' * (LANGUAGE_DETECTION_LIMIT - 1) + 'é\n'.encode('utf-8') + b'def f():\n    return 1\n'
+    response = _upload(client, data)
+
+    assert response.status_code == 302 and '/analyze/' in response.location
+    with app.app_context():
+        analysis = db.session.scalars(db.select(CodeAnalysis)).one()
+        assert analysis.file_size == len(data)
+        with open(analysis.file_path, 'rb') as f:
+            assert f.read() == data
+
+
+def test_latin1_upload_is_kept_and_decoded_with_replacements(client):
+    data = 'print("café")\n'.encode('latin-1')
+    response = _upload(client, data)
+
+    assert response.status_code == 302 and '/analyze/' in response.location
+    with app.app_context():
+        analysis = db.session.scalars(db.select(CodeAnalysis)).one()
+        assert analysis.file_size == len(data)
+        with open(analysis.file_path, 'rb') as f:
+            assert f.read() == data
+        assert get_code_content(analysis) == 'print("caf\ufffd")\n'